@@ -0,0 +1,605 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Scaling benchmark of Stock Balance Report over a synthetic ledger.
+
+Generates Items, Warehouses and Stock Ledger Entries prefixed with `SBR-BENCH-` in
+the current site, runs the report under representative filter combinations and
+compares wall time, peak traced memory, ledger rows scanned and query count with
+a stored baseline. On MariaDB the plans of the ledger queries every scenario ran
+are checked as well: the streamed ledger query, or the grouping and window queries
+of the SQL aggregation. The run fails when one reads the whole Stock Ledger Entry
+table or sorts it with a filesort. The latency of single pair point in time
+balances is measured too, against a p99 target of `POINT_BALANCE_P99_MS`. The run
+also fails when a metric regresses by more than `REGRESSION_TOLERANCE` over the
+baseline. Only run it on a local test site:
+
+	bench --site <site> stock-balance-benchmark --generate --scale 1000000 --save-baseline
+	bench --site <site> stock-balance-benchmark
+	bench --site <site> stock-balance-benchmark --cleanup
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from datetime import timedelta
+from math import ceil
+
+import frappe
+from frappe.query_builder.functions import Count
+from frappe.utils import add_months, flt, get_datetime, getdate, now, nowdate
+from frappe.utils.nestedset import get_root_of
+
+from trikaya.trikaya.report.stock_balance_report.instrumentation import QueryCounter
+from trikaya.trikaya.report.stock_balance_report.point_balance import get_balances
+from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+PREFIX = "SBR-BENCH-"
+BATCH_SIZE = 10000
+REGRESSION_TOLERANCE = 0.1
+COMPARED_METRICS = ("seconds", "peak_memory_mb", "queries")
+VARIANT_ATTRIBUTE = f"{PREFIX}SIZE"
+VARIANT_SIZES = ("S", "M", "L")
+POINT_BALANCE_CALLS = 500
+POINT_BALANCE_P99_MS = 5
+
+SCENARIOS = {
+	"default": {},
+	"stock_ageing": {"show_stock_ageing_data": 1},
+	"dimension_wise": {"show_dimension_wise_stock": 1},
+	"item_groups": {"item_group": [f"{PREFIX}GROUP-0", f"{PREFIX}GROUP-1"]},
+	"include_uom": {"include_uom": "Nos"},
+	"variant_attributes": {"show_variant_attributes": 1},
+}
+
+
+def run(
+	company: str | None = None,
+	scenarios: list[str] | None = None,
+	baseline: str | None = None,
+	save_baseline: bool = False,
+) -> dict:
+	"""Run the scenarios over the generated ledger, with the baseline they are compared with."""
+	company = company or get_company()
+	baseline = baseline or get_baseline_path()
+
+	results = {}
+	for scenario in scenarios or SCENARIOS:
+		filters = get_filters(company, SCENARIOS[scenario])
+		results[scenario], queries = measure(filters)
+		results[scenario]["plan_problems"] = check_query_plan(queries)
+
+	point_balance = measure_point_balance(company)
+
+	previous = {}
+	if os.path.exists(baseline):
+		with open(baseline) as f:
+			previous = json.load(f)
+
+	if save_baseline:
+		with open(baseline, "w") as f:
+			json.dump({**previous, **results, "point_balance": point_balance}, f, indent=1)
+
+	return {"scenarios": results, "point_balance": point_balance, "baseline": previous}
+
+
+def format_results(benchmark: dict) -> list[str]:
+	lines = [
+		format_result(scenario, result, benchmark["baseline"].get(scenario))
+		for scenario, result in benchmark["scenarios"].items()
+	]
+	lines.append(format_point_balance(benchmark["point_balance"], benchmark["baseline"].get("point_balance")))
+
+	return lines
+
+
+def get_regressions(benchmark: dict) -> list[str]:
+	"""Metrics of the run beyond `REGRESSION_TOLERANCE` over the baseline, or over their target."""
+	regressions = []
+	for scenario, result in benchmark["scenarios"].items():
+		for metric, change in get_changes(result, benchmark["baseline"].get(scenario)).items():
+			if change > REGRESSION_TOLERANCE:
+				regressions.append(f"{scenario} {metric} {change:+.0%}")
+
+	point_balance = benchmark["point_balance"]
+	if point_balance["p99_ms"] > POINT_BALANCE_P99_MS:
+		regressions.append(f"point_balance p99 above {POINT_BALANCE_P99_MS} ms")
+
+	baseline = benchmark["baseline"].get("point_balance")
+	if baseline and baseline.get("p99_ms"):
+		change = flt(point_balance["p99_ms"]) / flt(baseline["p99_ms"]) - 1
+		if change > REGRESSION_TOLERANCE:
+			regressions.append(f"point_balance p99_ms {change:+.0%}")
+
+	return regressions
+
+
+def get_changes(result: dict, baseline: dict | None) -> dict[str, float]:
+	"""Relative change of each compared metric over the baseline."""
+	changes = {}
+	for metric in COMPARED_METRICS:
+		if baseline and baseline.get(metric):
+			changes[metric] = flt(result[metric]) / flt(baseline[metric]) - 1
+
+	return changes
+
+
+def measure(filters: dict) -> tuple[dict, list[tuple]]:
+	"""Metrics of a run, and the queries it ran."""
+	report = StockBalanceReport(frappe._dict(filters))
+
+	started = time.perf_counter()
+	with QueryCounter(record=True) as counter:
+		_columns, data = report.run()
+
+	seconds = time.perf_counter() - started
+
+	result = {
+		"seconds": round(seconds, 3),
+		"peak_memory_mb": round(get_peak_memory_mb(filters), 1),
+		"queries": counter.count,
+		"rows_scanned": get_rows_scanned(report),
+		"rows": len(data),
+	}
+
+	return result, counter.queries
+
+
+def get_peak_memory_mb(filters: dict) -> float:
+	"""Peak memory allocated by a run of its own.
+
+	Measured in a second run, tracing allocations slows down the timed one. The peak
+	RSS of the process would never go down, and hide every scenario after the largest."""
+	report = StockBalanceReport(frappe._dict(filters))
+
+	tracemalloc.start()
+	try:
+		report.run()
+		return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+	finally:
+		tracemalloc.stop()
+
+
+def check_query_plan(queries: list[tuple]) -> list[str]:
+	"""Full scans and filesorts of the ledger in the EXPLAIN output of the ledger queries of a run.
+
+	A filesort of a temporary table sorts grouped rows, not the ledger, so it is allowed."""
+	if frappe.db.db_type != "mariadb":
+		return []
+
+	problems, explained = [], set()
+	for query, values in queries:
+		if query in explained or not is_ledger_query(query):
+			continue
+
+		explained.add(query)
+		for row in frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True):
+			if row.table != "tabStock Ledger Entry":
+				continue
+
+			if row.type == "ALL":
+				problems.append(f"full scan of {row.table}")
+
+			extra = row.Extra or ""
+			if "filesort" in extra and "temporary" not in extra:
+				problems.append(f"filesort on {row.table}")
+
+	return problems
+
+
+def is_ledger_query(query: str) -> bool:
+	return query.lstrip().lower().startswith(("select", "with")) and "tabStock Ledger Entry" in query
+
+
+def measure_point_balance(company: str, calls: int = POINT_BALANCE_CALLS) -> dict:
+	"""Latency percentiles of `get_balances` called for one generated item and warehouse at a time."""
+	item_codes = frappe.get_all(
+		"Item",
+		filters={"name": ("like", f"{PREFIX}ITEM-%"), "has_variants": 0},
+		order_by="name",
+		limit=calls,
+		pluck="name",
+	)
+	warehouses = frappe.get_all(
+		"Warehouse",
+		filters={"name": ("like", f"{PREFIX}WH-%"), "company": company},
+		order_by="name",
+		pluck="name",
+	)
+
+	as_of = getdate(nowdate())
+	latencies = []
+	for index, item_code in enumerate(item_codes):
+		request = {"item_code": item_code, "warehouse": warehouses[index % len(warehouses)]}
+
+		started = time.perf_counter()
+		get_balances([request], as_of)
+		latencies.append((time.perf_counter() - started) * 1000)
+
+	latencies.sort()
+	return {
+		"calls": len(latencies),
+		"p50_ms": round(get_percentile(latencies, 0.5), 2),
+		"p99_ms": round(get_percentile(latencies, 0.99), 2),
+	}
+
+
+def get_percentile(values: list[float], percentile: float) -> float:
+	"""Nearest rank percentile of sorted `values`."""
+	if not values:
+		return 0.0
+
+	return values[max(ceil(percentile * len(values)) - 1, 0)]
+
+
+def get_rows_scanned(report: StockBalanceReport) -> int:
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+
+	return report.get_stock_ledger_query(sle).select(Count("*")).run()[0][0]
+
+
+def format_result(scenario: str, result: dict, baseline: dict | None) -> str:
+	line = (
+		f"{scenario:>20}: {result['seconds']:8.2f}s {result['peak_memory_mb']:8.1f} MiB "
+		f"{result['queries']:6} queries {result['rows_scanned']:10} scanned {result['rows']:8} rows"
+	)
+
+	if result.get("plan_problems"):
+		line = f"{line}  PLAN: {', '.join(result['plan_problems'])}"
+
+	if not baseline:
+		return line
+
+	changes = []
+	for metric, change in get_changes(result, baseline).items():
+		flag = " REGRESSION" if change > REGRESSION_TOLERANCE else ""
+		changes.append(f"{metric} {change:+.0%}{flag}")
+
+	return f"{line}  [{', '.join(changes)}]"
+
+
+def format_point_balance(result: dict, baseline: dict | None) -> str:
+	line = (
+		f"{'point_balance':>20}: {result['calls']} calls, p50 {result['p50_ms']:.2f} ms, "
+		f"p99 {result['p99_ms']:.2f} ms"
+	)
+
+	if result["p99_ms"] > POINT_BALANCE_P99_MS:
+		line = f"{line}  ABOVE {POINT_BALANCE_P99_MS} ms TARGET"
+
+	if baseline and baseline.get("p99_ms"):
+		change = flt(result["p99_ms"]) / flt(baseline["p99_ms"]) - 1
+		flag = " REGRESSION" if change > REGRESSION_TOLERANCE else ""
+		line = f"{line}  [p99_ms {change:+.0%}{flag}]"
+
+	return line
+
+
+def get_filters(company: str, scenario_filters: dict) -> dict:
+	to_date = getdate(nowdate())
+
+	return {
+		"company": company,
+		"from_date": add_months(to_date, -3),
+		"to_date": to_date,
+		"ignore_closing_balance": 1,
+		**scenario_filters,
+	}
+
+
+def generate(
+	scale: int = 100000,
+	items: int | None = None,
+	warehouses: int = 20,
+	item_groups: int = 10,
+	days: int = 730,
+	company: str | None = None,
+) -> None:
+	"""Create a synthetic ledger of `scale` Stock Ledger Entries over the last `days` days."""
+	scale, warehouses, item_groups, days = int(scale), int(warehouses), int(item_groups), int(days)
+	items = int(items or max(scale // 100, 10))
+	company = company or get_company()
+
+	if frappe.db.exists("Stock Ledger Entry", {"name": ("like", f"{PREFIX}SLE-%")}):
+		# balances after transaction would not follow on from the existing entries
+		frappe.throw(f"A synthetic ledger already exists, run {__name__}.cleanup first")
+
+	group_names = create_item_groups(item_groups)
+	warehouse_names = create_warehouses(company, warehouses)
+	item_codes = create_items(items, group_names)
+	create_stock_ledger_entries(company, scale, item_codes, warehouse_names, days)
+
+	frappe.db.commit()  # nosemgrep
+
+
+def create_item_groups(count: int) -> list[str]:
+	parent = f"{PREFIX}GROUPS"
+	if not frappe.db.exists("Item Group", parent):
+		frappe.get_doc(
+			{
+				"doctype": "Item Group",
+				"item_group_name": parent,
+				"is_group": 1,
+				"parent_item_group": get_root_of("Item Group"),
+			}
+		).insert(ignore_permissions=True)
+
+	names = []
+	for index in range(count):
+		name = f"{PREFIX}GROUP-{index}"
+		if not frappe.db.exists("Item Group", name):
+			frappe.get_doc(
+				{"doctype": "Item Group", "item_group_name": name, "parent_item_group": parent}
+			).insert(ignore_permissions=True)
+
+		names.append(name)
+
+	return names
+
+
+def create_warehouses(company: str, count: int) -> list[str]:
+	abbr = frappe.get_cached_value("Company", company, "abbr")
+	parent = f"{PREFIX}WAREHOUSES - {abbr}"
+	if not frappe.db.exists("Warehouse", parent):
+		frappe.get_doc(
+			{
+				"doctype": "Warehouse",
+				"warehouse_name": f"{PREFIX}WAREHOUSES",
+				"company": company,
+				"is_group": 1,
+			}
+		).insert(ignore_permissions=True)
+
+	names = []
+	for index in range(count):
+		name = f"{PREFIX}WH-{index} - {abbr}"
+		if not frappe.db.exists("Warehouse", name):
+			frappe.get_doc(
+				{
+					"doctype": "Warehouse",
+					"warehouse_name": f"{PREFIX}WH-{index}",
+					"company": company,
+					"parent_warehouse": parent,
+				}
+			).insert(ignore_permissions=True)
+
+		names.append(name)
+
+	return names
+
+
+def create_items(count: int, item_groups: list[str]) -> list[str]:
+	"""Create `count` stock items, every other one a variant of a template, for the
+	variant attribute scenario."""
+	existing = set(frappe.get_all("Item", filters={"name": ("like", f"{PREFIX}ITEM-%")}, pluck="name"))
+	timestamp, user = now(), frappe.session.user
+	template = create_variant_template(item_groups[0])
+
+	item_codes, items, uoms, attributes = [], [], [], []
+	for index in range(count):
+		item_code = f"{PREFIX}ITEM-{index:07d}"
+		item_codes.append(item_code)
+		if item_code in existing:
+			continue
+
+		item_group = item_groups[index % len(item_groups)]
+		variant_of = None
+		if not index % 2:
+			variant_of = template
+			size = VARIANT_SIZES[index % len(VARIANT_SIZES)]
+			attributes.append(
+				(
+					frappe.generate_hash(),
+					item_code,
+					"Item",
+					"attributes",
+					1,
+					VARIANT_ATTRIBUTE,
+					size,
+					variant_of,
+					timestamp,
+					timestamp,
+					user,
+					user,
+				)
+			)
+
+		items.append(
+			(
+				item_code,
+				item_code,
+				item_code,
+				item_group,
+				"Nos",
+				1,
+				1,
+				variant_of,
+				timestamp,
+				timestamp,
+				user,
+				user,
+			)
+		)
+		uoms.append(
+			(frappe.generate_hash(), item_code, "Item", "uoms", 1, "Nos", 1, timestamp, timestamp, user, user)
+		)
+
+	item_fields = (
+		"name",
+		"item_code",
+		"item_name",
+		"item_group",
+		"stock_uom",
+		"is_stock_item",
+		"include_item_in_manufacturing",
+		"variant_of",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+	)
+	uom_fields = (
+		"name",
+		"parent",
+		"parenttype",
+		"parentfield",
+		"idx",
+		"uom",
+		"conversion_factor",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+	)
+
+	attribute_fields = (
+		"name",
+		"parent",
+		"parenttype",
+		"parentfield",
+		"idx",
+		"attribute",
+		"attribute_value",
+		"variant_of",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+	)
+
+	frappe.db.bulk_insert("Item", item_fields, items, chunk_size=BATCH_SIZE)
+	frappe.db.bulk_insert("UOM Conversion Detail", uom_fields, uoms, chunk_size=BATCH_SIZE)
+	frappe.db.bulk_insert("Item Variant Attribute", attribute_fields, attributes, chunk_size=BATCH_SIZE)
+
+	return item_codes
+
+
+def create_variant_template(item_group: str) -> str:
+	"""Template item with a size attribute, the variants are inserted in bulk."""
+	if not frappe.db.exists("Item Attribute", VARIANT_ATTRIBUTE):
+		frappe.get_doc(
+			{
+				"doctype": "Item Attribute",
+				"attribute_name": VARIANT_ATTRIBUTE,
+				"item_attribute_values": [{"attribute_value": size, "abbr": size} for size in VARIANT_SIZES],
+			}
+		).insert(ignore_permissions=True)
+
+	template = f"{PREFIX}ITEM-TEMPLATE"
+	if not frappe.db.exists("Item", template):
+		frappe.get_doc(
+			{
+				"doctype": "Item",
+				"item_code": template,
+				"item_group": item_group,
+				"stock_uom": "Nos",
+				"is_stock_item": 1,
+				"has_variants": 1,
+				"attributes": [{"attribute": VARIANT_ATTRIBUTE}],
+			}
+		).insert(ignore_permissions=True)
+
+	return template
+
+
+def create_stock_ledger_entries(
+	company: str, count: int, item_codes: list[str], warehouses: list[str], days: int
+) -> None:
+	fields = (
+		"name",
+		"company",
+		"item_code",
+		"warehouse",
+		"posting_date",
+		"posting_time",
+		"posting_datetime",
+		"voucher_type",
+		"voucher_no",
+		"actual_qty",
+		"qty_after_transaction",
+		"valuation_rate",
+		"stock_value",
+		"stock_value_difference",
+		"docstatus",
+		"is_cancelled",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+	)
+
+	start = get_datetime(nowdate()) - timedelta(days=days)
+	timestamp, user = now(), frappe.session.user
+	balances = {}
+
+	values = []
+	for index in range(count):
+		item_code = item_codes[index % len(item_codes)]
+		warehouse = warehouses[(index // len(item_codes)) % len(warehouses)]
+		posting_datetime = start + timedelta(seconds=int(index / count * days * 24 * 60 * 60))
+
+		# mostly receipts, so balances stay positive
+		actual_qty = -3.0 if index % 4 == 3 else 5.0
+		valuation_rate = 10.0 + index % 7
+		qty = balances.get((item_code, warehouse), 0.0) + actual_qty
+		balances[(item_code, warehouse)] = qty
+
+		values.append(
+			(
+				f"{PREFIX}SLE-{index:09d}",
+				company,
+				item_code,
+				warehouse,
+				posting_datetime.date(),
+				posting_datetime.time(),
+				posting_datetime,
+				"Stock Entry",
+				f"{PREFIX}STE-{index // 10:08d}",
+				actual_qty,
+				qty,
+				valuation_rate,
+				qty * valuation_rate,
+				actual_qty * valuation_rate,
+				1,
+				0,
+				timestamp,
+				timestamp,
+				user,
+				user,
+			)
+		)
+
+		if len(values) >= BATCH_SIZE:
+			frappe.db.bulk_insert("Stock Ledger Entry", fields, values)
+			frappe.db.commit()  # nosemgrep
+			values = []
+
+	frappe.db.bulk_insert("Stock Ledger Entry", fields, values)
+
+
+def cleanup() -> None:
+	"""Delete everything `generate` created."""
+	frappe.db.delete("Stock Ledger Entry", {"name": ("like", f"{PREFIX}SLE-%")})
+	frappe.db.delete("UOM Conversion Detail", {"parent": ("like", f"{PREFIX}ITEM-%")})
+	frappe.db.delete("Item Variant Attribute", {"parent": ("like", f"{PREFIX}ITEM-%")})
+	frappe.db.delete("Item", {"name": ("like", f"{PREFIX}ITEM-%")})
+	frappe.db.delete("Item Attribute Value", {"parent": VARIANT_ATTRIBUTE})
+	frappe.db.delete("Item Attribute", {"name": VARIANT_ATTRIBUTE})
+
+	for doctype in ("Warehouse", "Item Group"):
+		# children first, the nested set refuses to delete groups with children
+		for name in frappe.get_all(
+			doctype, filters={"name": ("like", f"{PREFIX}%")}, order_by="lft desc", pluck="name"
+		):
+			frappe.delete_doc(doctype, name, ignore_permissions=True, force=True)
+
+	frappe.db.commit()  # nosemgrep
+
+
+def get_company() -> str:
+	return frappe.defaults.get_global_default("company") or frappe.get_all("Company", limit=1, pluck="name")[0]
+
+
+def get_baseline_path() -> str:
+	return frappe.get_site_path("private", "stock_balance_benchmark.json")
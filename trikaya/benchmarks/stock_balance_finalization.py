@@ -0,0 +1,119 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Time and peak memory of turning the aggregated item warehouse map into report rows.
+
+Compares the fused `iter_report_rows` pass with the pipeline the report used
+before: a rounding and filtering pass over the whole map with a list of keys to
+drop, item master and reservation lookups for every key, then a third pass
+building the rows. Rows are consumed one at a time, as the export does. The run
+fails when the fused pass peaks above the three passes:
+
+	bench --site <site> stock-balance-row-benchmark --benchmark finalization --keys 200000
+"""
+
+import time
+import tracemalloc
+
+from trikaya.benchmarks.stock_balance_rows import (
+	aggregate,
+	filter_items_with_no_transactions,
+	get_report,
+)
+from trikaya.trikaya.report.stock_balance_report.item_master import get_item_details
+from trikaya.trikaya.report.stock_balance_report.reservations import get_reserved_qty
+from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+
+class ThreePassReport(StockBalanceReport):
+	"""Stock Balance Report finalizing the map in separate passes."""
+
+	def iter_report_rows(self):
+		item_warehouse_map = filter_items_with_no_transactions(
+			self.item_warehouse_map, self.float_precision, self.inventory_dimensions
+		)
+
+		items = get_item_details(key[1] for key in item_warehouse_map)
+		reserved_qty = get_reserved_qty((key[1], key[2]) for key in item_warehouse_map)
+
+		for row in item_warehouse_map.values():
+			report_data = row.as_dict()
+			if item := items.get(row.item_code):
+				report_data.item_name = item.item_name
+				report_data.item_group = item.item_group
+				report_data.stock_uom = item.stock_uom
+
+			report_data.reserved_stock = reserved_qty.get((row.item_code, row.warehouse), 0.0)
+			if report_data.bal_qty == 0 and report_data.bal_val == 0:
+				continue
+
+			yield report_data
+
+
+def run(keys: int = 200000, entries_per_key: int = 5) -> dict:
+	keys, entries_per_key = int(keys), int(entries_per_key)
+
+	return {
+		"three_pass": measure(ThreePassReport, keys, entries_per_key),
+		"fused": measure(StockBalanceReport, keys, entries_per_key),
+	}
+
+
+def format_results(results: dict) -> list[str]:
+	lines = [
+		f"{name:>10}: {result['rows']} rows in {result['seconds']:.2f}s, "
+		f"peak {result['peak_bytes'] / 1024 / 1024:.1f} MiB over the map"
+		for name, result in results.items()
+	]
+
+	baseline, fused = results["three_pass"], results["fused"]
+	lines.append(
+		f"saved: {1 - fused['peak_bytes'] / baseline['peak_bytes']:.0%} peak memory, "
+		f"{1 - fused['seconds'] / baseline['seconds']:.0%} time"
+	)
+
+	return lines
+
+
+def get_regressions(results: dict) -> list[str]:
+	"""Peak memory is what the fused pass is for, time is reported but too noisy to fail on."""
+	regressions = []
+	if results["fused"]["peak_bytes"] > results["three_pass"]["peak_bytes"]:
+		regressions.append("the fused pass peaks above the three passes")
+
+	if results["fused"]["rows"] != results["three_pass"]["rows"]:
+		regressions.append("the fused pass returns a different number of rows")
+
+	return regressions
+
+
+def measure(report_class, keys: int, entries_per_key: int) -> dict:
+	seconds, rows, _peak_bytes = finalize(report_class, keys, entries_per_key)
+	# measured in a second run, tracing allocations slows down the timed one
+	_seconds, _rows, peak_bytes = finalize(report_class, keys, entries_per_key, trace=True)
+
+	return {"seconds": seconds, "rows": rows, "peak_bytes": peak_bytes}
+
+
+def finalize(report_class, keys: int, entries_per_key: int, trace: bool = False) -> tuple[float, int, int]:
+	"""Seconds, row count and, when traced, peak memory allocated on top of the map."""
+	report = get_report(report_class)
+	report.items = {}
+	report.fifo_slots = None
+	report.period_fieldnames = []
+	report.item_warehouse_map = {}
+	aggregate(report, report.item_warehouse_map, keys, entries_per_key)
+
+	if trace:
+		tracemalloc.start()
+
+	started = time.perf_counter()
+	rows = sum(1 for _row in report.iter_report_rows())
+	seconds = time.perf_counter() - started
+
+	peak_bytes = 0
+	if trace:
+		peak_bytes = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+
+	return seconds, rows, peak_bytes
@@ -0,0 +1,216 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Memory and time of the Stock Balance Report item warehouse map.
+
+Compares the slotted `StockBalanceRow` accumulator with the `frappe._dict` per
+group by key the report used before, over a synthetic ledger generated in memory.
+The run fails when the slotted map takes more memory than the dict map:
+
+	bench --site <site> stock-balance-row-benchmark --benchmark rows --keys 200000
+"""
+
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import frappe
+from frappe.utils import flt
+
+from trikaya.trikaya.report.stock_balance_report.instrumentation import RunProfiler
+from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+WAREHOUSES_PER_ITEM = 20
+
+
+class DictRowReport(StockBalanceReport):
+	"""Stock Balance Report accumulating into one frappe._dict per group by key."""
+
+	def initialize_data(self, item_warehouse_map, group_by_key, entry):
+		opening_data = self.opening_data.get(group_by_key, {})
+
+		item_warehouse_map[group_by_key] = frappe._dict(
+			{
+				"item_code": entry.item_code,
+				"warehouse": entry.warehouse,
+				"item_group": entry.item_group,
+				"company": entry.company,
+				"currency": self.company_currency,
+				"stock_uom": entry.stock_uom,
+				"item_name": entry.item_name,
+				"opening_qty": opening_data.get("bal_qty") or 0.0,
+				"opening_val": opening_data.get("bal_val") or 0.0,
+				"opening_fifo_queue": opening_data.get("fifo_queue") or [],
+				"in_qty": 0.0,
+				"in_val": 0.0,
+				"out_qty": 0.0,
+				"out_val": 0.0,
+				"bal_qty": opening_data.get("bal_qty") or 0.0,
+				"bal_val": opening_data.get("bal_val") or 0.0,
+				"val_rate": 0.0,
+			}
+		)
+
+
+def filter_dict_rows(iwb_map, float_precision: float, inventory_dimensions: list | None = None):
+	pop_keys = []
+	for group_by_key in iwb_map:
+		qty_dict = iwb_map[group_by_key]
+
+		no_transactions = True
+		for key, val in qty_dict.items():
+			if inventory_dimensions and key in inventory_dimensions:
+				continue
+
+			if key in [
+				"item_code",
+				"warehouse",
+				"item_name",
+				"item_group",
+				"project",
+				"stock_uom",
+				"company",
+				"opening_fifo_queue",
+			]:
+				continue
+
+			val = flt(val, float_precision)
+			qty_dict[key] = val
+			if key != "val_rate" and val:
+				no_transactions = False
+
+		if no_transactions:
+			pop_keys.append(group_by_key)
+
+	for key in pop_keys:
+		iwb_map.pop(key)
+
+	return iwb_map
+
+
+def filter_items_with_no_transactions(
+	iwb_map, float_precision: float, inventory_dimensions: list | None = None
+):
+	"""Round the slotted rows and drop those without transactions, in a pass of its own."""
+	pop_keys = []
+	for group_by_key, row in iwb_map.items():
+		if not row.round_amounts(float_precision):
+			pop_keys.append(group_by_key)
+
+	for key in pop_keys:
+		iwb_map.pop(key)
+
+	return iwb_map
+
+
+def run(keys: int = 200000, entries_per_key: int = 5) -> dict:
+	keys, entries_per_key = int(keys), int(entries_per_key)
+
+	return {
+		"dict": measure(DictRowReport, filter_dict_rows, keys, entries_per_key),
+		"slots": measure(StockBalanceReport, filter_items_with_no_transactions, keys, entries_per_key),
+	}
+
+
+def format_results(results: dict) -> list[str]:
+	lines = [
+		f"{name:>6}: aggregate {result['aggregate_seconds']:.2f}s, filter {result['filter_seconds']:.2f}s, "
+		f"map {result['map_bytes'] / 1024 / 1024:.1f} MiB"
+		for name, result in results.items()
+	]
+
+	baseline, slots = results["dict"], results["slots"]
+	lines.append(
+		f"saved: {1 - slots['map_bytes'] / baseline['map_bytes']:.0%} memory, "
+		f"{1 - slots['total_seconds'] / baseline['total_seconds']:.0%} time"
+	)
+
+	return lines
+
+
+def get_regressions(results: dict) -> list[str]:
+	"""Memory is what the slotted rows are for, time is reported but too noisy to fail on."""
+	if results["slots"]["map_bytes"] > results["dict"]["map_bytes"]:
+		return ["slotted rows take more memory than dict rows"]
+
+	return []
+
+
+def measure(report_class, filter_function, keys: int, entries_per_key: int) -> dict:
+	report = get_report(report_class)
+
+	item_warehouse_map = {}
+	started = time.perf_counter()
+	aggregate(report, item_warehouse_map, keys, entries_per_key)
+	aggregated = time.perf_counter()
+	filter_function(item_warehouse_map, report.float_precision, report.inventory_dimensions)
+	finished = time.perf_counter()
+
+	# measured in a second pass, tracing allocations slows down the timed one
+	item_warehouse_map = {}
+	tracemalloc.start()
+	aggregate(report, item_warehouse_map, keys, entries_per_key)
+	map_bytes, _peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	return {
+		"aggregate_seconds": aggregated - started,
+		"filter_seconds": finished - aggregated,
+		"total_seconds": finished - started,
+		"map_bytes": map_bytes,
+	}
+
+
+def aggregate(report, item_warehouse_map: dict, keys: int, entries_per_key: int) -> None:
+	for entry in get_entries(keys, entries_per_key):
+		group_by_key = report.get_group_by_key(entry)
+		if group_by_key not in item_warehouse_map:
+			report.initialize_data(item_warehouse_map, group_by_key, entry)
+
+		report.prepare_item_warehouse_map(item_warehouse_map, entry, group_by_key)
+
+
+def get_report(report_class) -> StockBalanceReport:
+	# skip __init__, it looks up the company currency
+	report = report_class.__new__(report_class)
+	report.filters = frappe._dict()
+	report.from_date = date(2026, 1, 1)
+	report.to_date = date(2026, 3, 31)
+	report.company_currency = "INR"
+	report.float_precision = 3
+	report.inventory_dimensions = []
+	report.opening_data = frappe._dict()
+	report.opening_vouchers = {}
+	report.period_starts = []
+	report.profiler = RunProfiler()
+
+	return report
+
+
+def get_entries(keys: int, entries_per_key: int):
+	start = date(2025, 12, 1)
+
+	for index in range(keys * entries_per_key):
+		key = index % keys
+		item_code = f"BENCH-ITEM-{key // WAREHOUSES_PER_ITEM:06d}"
+		actual_qty = 10.0 if index % 3 else -4.0
+
+		yield frappe._dict(
+			{
+				"company": "Benchmark Company",
+				"item_code": item_code,
+				"name": item_code,
+				"warehouse": f"Benchmark Warehouse {key % WAREHOUSES_PER_ITEM:02d}",
+				"item_group": "Products",
+				"stock_uom": "Nos",
+				"item_name": item_code,
+				"voucher_type": "Stock Entry",
+				"voucher_no": f"BENCH-STE-{index}",
+				"posting_date": start + timedelta(days=index % 120),
+				"actual_qty": actual_qty,
+				"qty_after_transaction": 0.0,
+				"stock_value_difference": actual_qty * 12.5,
+				"valuation_rate": 12.5,
+				"is_reconciliation": 0,
+			}
+		)
@@ -0,0 +1,133 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("reconcile-stock-balance-snapshot")
+@click.option("--company", required=True, help="Company to reconcile")
+@click.option("--from-date", required=True, help="Report from date (YYYY-MM-DD)")
+@click.option("--to-date", required=True, help="Report to date (YYYY-MM-DD)")
+@click.option("--dimension-wise", is_flag=True, default=False, help="Reconcile dimension wise balances")
+@pass_context
+def reconcile_stock_balance_snapshot(context, company, from_date, to_date, dimension_wise=False):
+	"""Prove that Stock Balance Report opened from a snapshot matches a full ledger scan."""
+	import frappe
+
+	from trikaya.trikaya.doctype.stock_balance_snapshot.stock_balance_snapshot import reconcile_snapshot
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+
+	try:
+		mismatches = reconcile_snapshot(company, from_date, to_date, dimension_wise)
+	finally:
+		frappe.destroy()
+
+	for mismatch in mismatches:
+		click.echo(mismatch)
+
+	if mismatches:
+		click.secho(f"{len(mismatches)} mismatches found", fg="red")
+		raise SystemExit(1)
+
+	click.secho("Snapshot matches the full ledger scan", fg="green")
+
+
+@click.command("stock-balance-benchmark")
+@click.option("--generate", is_flag=True, default=False, help="Generate the synthetic ledger first")
+@click.option("--scale", type=int, default=100000, help="Stock Ledger Entries to generate")
+@click.option("--items", type=int, help="Items to generate, scale / 100 by default")
+@click.option("--warehouses", type=int, default=20, help="Warehouses to generate")
+@click.option("--scenario", "scenarios", multiple=True, help="Scenario to run, all by default")
+@click.option("--baseline", help="Baseline JSON file, private/stock_balance_benchmark.json by default")
+@click.option("--save-baseline", is_flag=True, default=False, help="Store the results as the baseline")
+@click.option("--cleanup", is_flag=True, default=False, help="Delete the synthetic ledger and exit")
+@pass_context
+def stock_balance_benchmark(
+	context,
+	generate=False,
+	scale=100000,
+	items=None,
+	warehouses=20,
+	scenarios=None,
+	baseline=None,
+	save_baseline=False,
+	cleanup=False,
+):
+	"""Benchmark Stock Balance Report over a synthetic ledger. Use a local test site only."""
+	import frappe
+
+	from trikaya.benchmarks import stock_balance
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+
+	try:
+		if cleanup:
+			stock_balance.cleanup()
+			return
+
+		if generate:
+			stock_balance.generate(scale=scale, items=items, warehouses=warehouses)
+
+		baseline = baseline or stock_balance.get_baseline_path()
+		benchmark = stock_balance.run(
+			scenarios=list(scenarios), baseline=baseline, save_baseline=save_baseline
+		)
+	finally:
+		frappe.destroy()
+
+	for line in stock_balance.format_results(benchmark):
+		click.echo(line)
+
+	if save_baseline:
+		click.echo(f"baseline saved to {baseline}")
+
+	failed = False
+	if any(result["plan_problems"] for result in benchmark["scenarios"].values()):
+		click.secho("The ledger query plan scans or sorts the whole ledger", fg="red")
+		failed = True
+
+	if regressions := stock_balance.get_regressions(benchmark):
+		click.secho(f"Regressions: {', '.join(regressions)}", fg="red")
+		failed = True
+
+	if failed:
+		raise SystemExit(1)
+
+
+@click.command("stock-balance-row-benchmark")
+@click.option(
+	"--benchmark", type=click.Choice(["rows", "finalization"]), default="rows", help="Benchmark to run"
+)
+@click.option("--keys", type=int, default=200000, help="Group by keys to aggregate")
+@click.option("--entries-per-key", type=int, default=5, help="Ledger entries per key")
+@pass_context
+def stock_balance_row_benchmark(context, benchmark="rows", keys=200000, entries_per_key=5):
+	"""Compare the Stock Balance Report row implementations over a ledger generated in memory."""
+	import importlib
+
+	import frappe
+
+	module = importlib.import_module(f"trikaya.benchmarks.stock_balance_{benchmark}")
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+
+	try:
+		results = module.run(keys=keys, entries_per_key=entries_per_key)
+	finally:
+		frappe.destroy()
+
+	click.echo(f"{keys} keys, {keys * entries_per_key} ledger entries")
+	for line in module.format_results(results):
+		click.echo(line)
+
+	if regressions := module.get_regressions(results):
+		click.secho(f"Regressions: {', '.join(regressions)}", fg="red")
+		raise SystemExit(1)
+
+
+commands = [reconcile_stock_balance_snapshot, stock_balance_benchmark, stock_balance_row_benchmark]
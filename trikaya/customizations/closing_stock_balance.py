@@ -0,0 +1,9 @@
+import frappe
+
+
+def delete_stock_balance_snapshot(doc, method):
+	"""Drop the indexed copy of the prepared data of a cancelled Closing Stock Balance."""
+	for name in frappe.get_all(
+		"Stock Balance Snapshot", filters={"closing_stock_balance": doc.name}, pluck="name"
+	):
+		frappe.delete_doc("Stock Balance Snapshot", name, ignore_permissions=True, force=True)
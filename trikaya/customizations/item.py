@@ -0,0 +1,11 @@
+from trikaya.trikaya.report.stock_balance_report.item_master import invalidate
+from trikaya.trikaya.report.stock_balance_report.result_cache import invalidate_master_data_after_commit
+
+
+def invalidate_item_master(doc, method):
+	"""UOM conversion and variant attribute rows are saved with their Item, so this covers them too."""
+	invalidate()
+
+
+def invalidate_stock_balance_report_cache(doc, method):
+	invalidate_master_data_after_commit()
@@ -0,0 +1,17 @@
+from trikaya.trikaya.report.stock_balance_report import item_master
+from trikaya.trikaya.report.stock_balance_report.result_cache import invalidate_master_data_after_commit
+from trikaya.trikaya.report.stock_balance_report.tree_filters import invalidate
+
+
+def invalidate_tree_bounds(doc, method):
+	"""Moving a node renumbers the lft/rgt of the whole tree, so any change drops the cached ranges."""
+	invalidate(doc.doctype)
+
+
+def invalidate_stock_balance_report_cache(doc, method):
+	invalidate_master_data_after_commit()
+
+
+def invalidate_item_master(doc, method):
+	"""Items keep the name of their group, renaming or merging a group changes it on every item."""
+	item_master.invalidate()
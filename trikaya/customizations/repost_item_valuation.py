@@ -0,0 +1,20 @@
+from trikaya.trikaya.doctype.stock_balance_snapshot.stock_balance_snapshot import mark_snapshots_stale
+from trikaya.trikaya.report.stock_balance_report.result_cache import invalidate
+
+
+def invalidate_stock_balance_snapshots(doc, method):
+	"""
+	Reposting rewrites the valuation of future ledger entries directly in the
+	database, so snapshots are invalidated once the repost has completed.
+	"""
+	if doc.status != "Completed":
+		return
+
+	mark_snapshots_stale(doc.company, doc.posting_date)
+
+
+def invalidate_stock_balance_report_cache(doc, method):
+	if doc.status != "Completed":
+		return
+
+	invalidate(doc.company)
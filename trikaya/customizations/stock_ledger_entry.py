@@ -0,0 +1,19 @@
+from trikaya.trikaya.doctype.stock_balance_snapshot.stock_balance_snapshot import queue_ledger_entry
+from trikaya.trikaya.report.stock_balance_report.result_cache import invalidate_after_commit
+
+
+def update_stock_balance_snapshots(doc, method):
+	"""
+	Back-dated ledger entries, and the reversal entries submitted when an entry is
+	cancelled, move the balances of every Stock Balance Snapshot from their
+	posting date onwards.
+	"""
+	queue_ledger_entry(doc)
+
+
+def invalidate_stock_balance_report_cache(doc, method):
+	"""
+	ERPNext cancels ledger entries with an update and submits reversal entries,
+	so submitting covers new and cancelled entries alike.
+	"""
+	invalidate_after_commit(doc.company)
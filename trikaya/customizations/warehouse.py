@@ -0,0 +1,10 @@
+from trikaya.trikaya.report.stock_balance_report.result_cache import invalidate_master_data_after_commit
+from trikaya.trikaya.report.stock_balance_report.tree_filters import invalidate
+
+
+def invalidate_tree_bounds(doc, method):
+	invalidate(doc.doctype)
+
+
+def invalidate_stock_balance_report_cache(doc, method):
+	invalidate_master_data_after_commit()
@@ -88,7 +88,7 @@ doctype_js = {
 # ------------
 
 # before_install = "trikaya.install.before_install"
-# after_install = "trikaya.install.after_install"
+after_install = "trikaya.install.after_install"
 
 # Uninstallation
 # ------------
@@ -143,7 +143,79 @@ override_doctype_class = {
 doc_events = {
     "Supplier": {
         "after_insert": "trikaya.customizations.supplier.create_bank_account_for_supplier"
-    }
+    },
+    "Stock Ledger Entry": {
+        "on_submit": [
+            "trikaya.customizations.stock_ledger_entry.update_stock_balance_snapshots",
+            "trikaya.customizations.stock_ledger_entry.invalidate_stock_balance_report_cache",
+        ],
+    },
+    "Repost Item Valuation": {
+        "on_change": [
+            "trikaya.customizations.repost_item_valuation.invalidate_stock_balance_snapshots",
+            "trikaya.customizations.repost_item_valuation.invalidate_stock_balance_report_cache",
+        ]
+    },
+    "Closing Stock Balance": {
+        "on_cancel": "trikaya.customizations.closing_stock_balance.delete_stock_balance_snapshot",
+    },
+    "Item Group": {
+        "on_update": [
+            "trikaya.customizations.item_group.invalidate_tree_bounds",
+            "trikaya.customizations.item_group.invalidate_stock_balance_report_cache",
+            "trikaya.customizations.item_group.invalidate_item_master",
+        ],
+        "on_trash": [
+            "trikaya.customizations.item_group.invalidate_tree_bounds",
+            "trikaya.customizations.item_group.invalidate_stock_balance_report_cache",
+            "trikaya.customizations.item_group.invalidate_item_master",
+        ],
+        "after_rename": [
+            "trikaya.customizations.item_group.invalidate_tree_bounds",
+            "trikaya.customizations.item_group.invalidate_stock_balance_report_cache",
+            "trikaya.customizations.item_group.invalidate_item_master",
+        ],
+    },
+    "Warehouse": {
+        "on_update": [
+            "trikaya.customizations.warehouse.invalidate_tree_bounds",
+            "trikaya.customizations.warehouse.invalidate_stock_balance_report_cache",
+        ],
+        "on_trash": [
+            "trikaya.customizations.warehouse.invalidate_tree_bounds",
+            "trikaya.customizations.warehouse.invalidate_stock_balance_report_cache",
+        ],
+        "after_rename": [
+            "trikaya.customizations.warehouse.invalidate_tree_bounds",
+            "trikaya.customizations.warehouse.invalidate_stock_balance_report_cache",
+        ],
+    },
+    "Item": {
+        "on_update": [
+            "trikaya.customizations.item.invalidate_item_master",
+            "trikaya.customizations.item.invalidate_stock_balance_report_cache",
+        ],
+        "on_trash": [
+            "trikaya.customizations.item.invalidate_item_master",
+            "trikaya.customizations.item.invalidate_stock_balance_report_cache",
+        ],
+        "after_rename": [
+            "trikaya.customizations.item.invalidate_item_master",
+            "trikaya.customizations.item.invalidate_stock_balance_report_cache",
+        ],
+    },
+}
+
+scheduler_events = {
+    "daily": [
+        "trikaya.trikaya.report.stock_balance_report.background.delete_expired_results",
+        "trikaya.trikaya.report.stock_balance_report.export.delete_expired_exports",
+    ],
+    "daily_long": [
+        "trikaya.trikaya.report.stock_balance_report.closing_balances.generate_closing_balances",
+        "trikaya.trikaya.doctype.stock_balance_snapshot.stock_balance_snapshot.rebuild_stale_snapshots",
+        "trikaya.trikaya.doctype.stock_balance_snapshot.stock_balance_snapshot.index_closing_balances",
+    ],
 }
 
 
@@ -0,0 +1,6 @@
+from trikaya.patches import add_stock_balance_report_indexes
+
+
+def after_install():
+	# patches are marked as completed on install without running, so add the indexes here too
+	add_stock_balance_report_indexes.execute()
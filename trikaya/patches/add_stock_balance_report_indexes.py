@@ -0,0 +1,29 @@
+import frappe
+
+# Stock Balance Report reads the ledger of a company in (posting_datetime, creation)
+# order, or the ledger of a few items when filtered by item. With the equality
+# columns first and the sort columns next, MariaDB walks the index in order instead
+# of sorting every matching entry, and checks docstatus without reading the row.
+INDEXES = {
+	"stock_balance_report_company_index": [
+		"company",
+		"is_cancelled",
+		"posting_datetime",
+		"creation",
+		"docstatus",
+	],
+	"stock_balance_report_item_index": [
+		"item_code",
+		"is_cancelled",
+		"posting_datetime",
+		"creation",
+		"docstatus",
+	],
+	# the delta endpoint looks up the entries of a company created since its watermark
+	"stock_balance_report_creation_index": ["company", "creation"],
+}
+
+
+def execute():
+	for index_name, fields in INDEXES.items():
+		frappe.db.add_index("Stock Ledger Entry", fields, index_name)
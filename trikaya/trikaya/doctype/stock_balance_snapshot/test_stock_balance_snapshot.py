@@ -0,0 +1,156 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt, get_datetime
+
+from trikaya.customizations.stock_ledger_entry import update_stock_balance_snapshots
+from trikaya.trikaya.doctype.stock_balance_snapshot.stock_balance_snapshot import (
+	PERIOD_END_CACHE_KEY,
+	apply_pending_ledger_entries,
+	reconcile_snapshot,
+)
+
+test_dependencies = ["Company", "Item", "Warehouse"]
+
+COMPANY = "_Test Company"
+VOUCHER_PREFIX = "_T-SBS-"
+
+
+def make_stock_ledger_entry(
+	item_code: str,
+	warehouse: str,
+	posting_date: str,
+	qty: float,
+	valuation_rate: float,
+	incoming_rate: float | None = None,
+	**fields,
+):
+	"""Insert a submitted ledger entry as ERPNext writes it, without posting a voucher.
+
+	Quantities and values are taken as given, so the report reads exactly these entries."""
+	posting_time = fields.pop("posting_time", "10:00:00")
+	if incoming_rate is None:
+		incoming_rate = valuation_rate
+
+	sle = frappe.get_doc(
+		{
+			"doctype": "Stock Ledger Entry",
+			"company": COMPANY,
+			"item_code": item_code,
+			"warehouse": warehouse,
+			"posting_date": posting_date,
+			"posting_time": posting_time,
+			"posting_datetime": get_datetime(f"{posting_date} {posting_time}"),
+			"voucher_type": "Stock Entry",
+			"voucher_no": VOUCHER_PREFIX + frappe.generate_hash(length=8),
+			"actual_qty": qty,
+			"valuation_rate": valuation_rate,
+			"incoming_rate": incoming_rate if qty > 0 else 0,
+			"stock_value_difference": qty * incoming_rate,
+			"docstatus": 1,
+			**fields,
+		}
+	)
+	sle.db_insert()
+
+	return sle
+
+
+def cancel_stock_ledger_entry(sle):
+	"""Cancel the entry as ERPNext does: flag it and submit a cancelled reversal."""
+	frappe.db.set_value("Stock Ledger Entry", sle.name, "is_cancelled", 1, update_modified=False)
+
+	return make_stock_ledger_entry(
+		sle.item_code,
+		sle.warehouse,
+		sle.posting_date,
+		-sle.actual_qty,
+		sle.valuation_rate,
+		incoming_rate=sle.incoming_rate,
+		posting_time=sle.posting_time,
+		voucher_no=sle.voucher_no,
+		is_cancelled=1,
+	)
+
+
+def delete_stock_ledger_entries():
+	frappe.db.delete("Stock Ledger Entry", {"voucher_no": ("like", f"{VOUCHER_PREFIX}%")})
+
+
+class TestStockBalanceSnapshot(FrappeTestCase):
+	def setUp(self):
+		self.addCleanup(self.delete_fixtures)
+
+	def delete_fixtures(self):
+		for name in frappe.get_all("Stock Balance Snapshot", {"company": COMPANY}, pluck="name"):
+			frappe.delete_doc("Stock Balance Snapshot", name, force=True)
+
+		delete_stock_ledger_entries()
+		frappe.cache.hdel(PERIOD_END_CACHE_KEY, COMPANY)
+		# `build` commits, so the fixtures are committed away as well
+		frappe.db.commit()  # nosemgrep
+
+	def make_snapshot(self, period_end: str):
+		snapshot = frappe.get_doc(
+			{"doctype": "Stock Balance Snapshot", "company": COMPANY, "period_end": period_end}
+		)
+		# built here instead of in the queued job
+		snapshot.db_insert()
+		snapshot.build()
+		frappe.cache.hdel(PERIOD_END_CACHE_KEY, COMPANY)
+
+		return snapshot
+
+	def submit(self, sle):
+		update_stock_balance_snapshots(sle, "on_submit")
+		apply_pending_ledger_entries()
+
+		return sle
+
+	def test_snapshot_opening_matches_full_scan(self):
+		make_stock_ledger_entry("_Test Item", "_Test Warehouse - _TC", "2026-01-05", 10, 100)
+		make_stock_ledger_entry("_Test Item", "_Test Warehouse - _TC", "2026-01-10", -4, 100)
+		later = make_stock_ledger_entry("_Test Item", "_Test Warehouse - _TC", "2026-01-20", 5, 113.64, 130)
+		make_stock_ledger_entry("_Test Item 2", "_Test Warehouse 1 - _TC", "2026-01-08", 8, 50)
+		make_stock_ledger_entry("_Test Item 2", "_Test Warehouse 1 - _TC", "2026-01-25", -3, 50)
+		cancelled = make_stock_ledger_entry("_Test Item", "_Test Warehouse 1 - _TC", "2026-01-18", 4, 30)
+		make_stock_ledger_entry("_Test Item", "_Test Warehouse - _TC", "2026-02-03", -2, 113.64)
+
+		snapshot = self.make_snapshot("2026-01-31")
+
+		# back-dated into the snapshot, before the last entry of the pair
+		for item_code, warehouse, posting_date, qty, valuation_rate, incoming_rate in (
+			("_Test Item 2", "_Test Warehouse 1 - _TC", "2026-01-12", 2, 56, 80),
+			("_Test Item", "_Test Warehouse - _TC", "2026-01-15", 3, 120, 200),
+		):
+			self.submit(
+				make_stock_ledger_entry(item_code, warehouse, posting_date, qty, valuation_rate, incoming_rate)
+			)
+
+		self.submit(cancel_stock_ledger_entry(cancelled))
+		self.submit(cancel_stock_ledger_entry(later))
+
+		entries = {
+			(row.item_code, row.warehouse): row
+			for row in frappe.get_all(
+				"Stock Balance Snapshot Entry",
+				filters={"snapshot": snapshot.name},
+				fields=["item_code", "warehouse", "bal_qty", "bal_val", "val_rate"],
+			)
+		}
+
+		self.assertNotIn(("_Test Item", "_Test Warehouse 1 - _TC"), entries)
+
+		# the rate of the last entry in posting order, not the balance value over the quantity
+		item_2 = entries[("_Test Item 2", "_Test Warehouse 1 - _TC")]
+		self.assertEqual(flt(item_2.bal_qty), 7)
+		self.assertEqual(flt(item_2.bal_val), 410)
+		self.assertEqual(flt(item_2.val_rate), 50)
+
+		item = entries[("_Test Item", "_Test Warehouse - _TC")]
+		self.assertEqual(flt(item.bal_qty), 9)
+		self.assertEqual(flt(item.val_rate), 120)
+
+		self.assertEqual(reconcile_snapshot(COMPANY, "2026-02-01", "2026-02-28"), [])
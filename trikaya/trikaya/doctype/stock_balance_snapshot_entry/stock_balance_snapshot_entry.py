@@ -0,0 +1,33 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class StockBalanceSnapshotEntry(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		bal_qty: DF.Float
+		bal_val: DF.Float
+		company: DF.Link | None
+		fifo_queue: DF.LongText | None
+		inventory_dimensions: DF.SmallText | None
+		item_code: DF.Link | None
+		name: DF.Int | None
+		snapshot: DF.Link
+		val_rate: DF.Float
+		warehouse: DF.Link | None
+	# end: auto-generated types
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Stock Balance Snapshot Entry", ["snapshot", "item_code", "warehouse"])
@@ -0,0 +1,240 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Queued execution of long Stock Balance Report runs.
+
+Runs over more than `stock_balance_report_background_days` days are not built in
+the web request. The first request queues a job on the long queue; every request
+with the same filters attaches to that job instead of queueing another one. The job
+publishes its progress to every attached user over realtime and stores the result
+as a gzipped private file, which later requests return with the time it was built.
+
+Runs are keyed by the filters only, the ledger watermark captured when the job is
+queued is stored with the result. Once the ledger moves past it, the stored result
+is still returned and a new run is queued if the result is older than
+`stock_balance_report_background_refresh` seconds, so reloading the report when a
+run completes does not queue the next one.
+"""
+
+import gzip
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, date_diff, now_datetime, time_diff_in_seconds
+
+from trikaya.trikaya.report.stock_balance_report.closing_balances import record_filter_usage
+from trikaya.trikaya.report.stock_balance_report.result_cache import (
+	ALL_COMPANIES,
+	get_filters_hash,
+	get_watermark,
+)
+
+DEFAULT_BACKGROUND_DAYS = 92
+DEFAULT_REFRESH_INTERVAL = 15 * 60
+RESULT_TTL = 24 * 60 * 60
+PROGRESS_EVENT = "stock_balance_report_progress"
+FILE_PREFIX = "stock-balance-report-"
+
+
+def get_background_days() -> int:
+	return cint(frappe.conf.get("stock_balance_report_background_days", DEFAULT_BACKGROUND_DAYS))
+
+
+def get_refresh_interval() -> int:
+	return cint(frappe.conf.get("stock_balance_report_background_refresh") or DEFAULT_REFRESH_INTERVAL)
+
+
+def get_phases() -> dict[str, str]:
+	return {
+		"opening": _("Loading opening balances"),
+		"ledger": _("Scanning stock ledger"),
+		"ageing": _("Computing stock ageing"),
+		"enrichment": _("Adding reservations and attributes"),
+	}
+
+
+def is_background_run(filters) -> bool:
+	"""Long runs requested over the web are queued, everything else runs in the caller."""
+	if not getattr(frappe.local, "request", None):
+		return False
+
+	background_days = get_background_days()
+	if not background_days:
+		return False
+
+	return date_diff(filters.get("to_date"), filters.get("from_date")) > background_days
+
+
+def get_background_result(filters, report):
+	"""Latest stored result of the run and the time it was built, or the report columns and a
+	message while the first run is queued."""
+	key = get_background_key(filters)
+	state = frappe.cache.get_value(get_state_key(key), expires=True) or {}
+	watermark = get_watermark(filters.get("company"))
+
+	result = None
+	if state.get("file") and frappe.db.exists("File", state["file"]):
+		result = load_result(state["file"])
+
+	attach(key)
+	running = state.get("status") in ("Queued", "In Progress")
+	if not running and (result is None or is_outdated(state, watermark)):
+		set_state(key, **{**state, "status": "Queued"})
+		record_filter_usage(filters)
+		frappe.enqueue(
+			run_in_background,
+			queue="long",
+			timeout=cint(frappe.conf.get("stock_balance_report_background_timeout")) or 3600,
+			job_id=f"stock_balance_report::{key}",
+			deduplicate=True,
+			filters=dict(filters),
+			key=key,
+			watermark=watermark,
+		)
+		running = True
+
+	if result is not None:
+		columns, data = result
+		message = _("Prepared as of {0}.").format(frappe.format(state["as_of"], "Datetime"))
+		if running:
+			message += " " + _("A newer run is being prepared in the background.")
+
+		return columns, data, message
+
+	if state.get("status") == "Failed":
+		message = _("The previous run failed and has been queued again.")
+	else:
+		message = _("The report is being prepared in the background and will load once it is ready.")
+
+	return report.get_columns(), [], message
+
+
+def is_outdated(state: dict, watermark: str) -> bool:
+	"""The ledger moved since the stored result was queued, and the result is not a recent one."""
+	if state.get("watermark") == watermark:
+		return False
+
+	return time_diff_in_seconds(now_datetime(), state["as_of"]) > get_refresh_interval()
+
+
+def run_in_background(filters: dict, key: str, watermark: str) -> None:
+	from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+	update_state(key, status="In Progress")
+	as_of = now_datetime()
+
+	def progress(phase: str, **details):
+		publish(key, status="In Progress", phase=phase, **details)
+
+	try:
+		report = StockBalanceReport(frappe._dict(filters))
+		report.progress = progress
+		result = report.run()
+		file_name = store_result(key, result)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error("Stock Balance Report background run failed")
+		update_state(key, status="Failed")
+		publish(key, status="Failed")
+		return
+
+	previous_file = update_state(
+		key, status="Completed", file=file_name, as_of=str(as_of), watermark=watermark
+	)
+	if previous_file and frappe.db.exists("File", previous_file):
+		frappe.delete_doc("File", previous_file, ignore_permissions=True)
+
+	publish(key, status="Completed")
+
+
+def publish(key: str, status: str, phase: str | None = None, **details) -> None:
+	phases = get_phases()
+	message = {
+		"status": status,
+		"phase": phase,
+		"step": list(phases).index(phase) + 1 if phase else len(phases),
+		"steps": len(phases),
+		"description": phases.get(phase, ""),
+		**details,
+	}
+
+	if rows := details.get("rows"):
+		message["description"] = _("{0}: {1} rows").format(
+			message["description"], frappe.format(rows, "Int")
+		)
+
+	for user in frappe.cache.smembers(get_users_key(key)):
+		frappe.publish_realtime(PROGRESS_EVENT, message, user=frappe.safe_decode(user))
+
+
+def attach(key: str) -> None:
+	users_key = get_users_key(key)
+	frappe.cache.sadd(users_key, frappe.session.user)
+	frappe.cache.expire(users_key, RESULT_TTL)
+
+
+def set_state(key: str, **state) -> None:
+	frappe.cache.set_value(get_state_key(key), state, expires_in_sec=RESULT_TTL)
+
+
+def update_state(key: str, **changes) -> str | None:
+	"""Update the state of `key`, keeping the stored result of the previous run until it is
+	replaced. Returns the file of the previous result."""
+	state = frappe.cache.get_value(get_state_key(key), expires=True) or {}
+	set_state(key, **{**state, **changes})
+
+	return state.get("file")
+
+
+def store_result(key: str, result) -> str:
+	columns, data = result[:2]
+	content = gzip.compress(frappe.as_json({"columns": columns, "data": data}, indent=None).encode())
+
+	file = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": f"{FILE_PREFIX}{frappe.generate_hash(length=12)}.json.gz",
+			"is_private": 1,
+			"content": content,
+		}
+	)
+	file.insert(ignore_permissions=True)
+
+	return file.name
+
+
+def load_result(file_name: str):
+	content = frappe.get_doc("File", file_name).get_content()
+	result = json.loads(gzip.decompress(content))
+
+	return result["columns"], [frappe._dict(row) for row in result["data"]]
+
+
+def delete_expired_results() -> None:
+	"""Delete stored results older than their cached state."""
+	expired = frappe.get_all(
+		"File",
+		filters={
+			"file_name": ("like", f"{FILE_PREFIX}%.json.gz"),
+			"attached_to_doctype": ("is", "not set"),
+			"creation": ("<", add_to_date(now_datetime(), seconds=-RESULT_TTL)),
+		},
+		pluck="name",
+	)
+
+	for name in expired:
+		frappe.delete_doc("File", name, ignore_permissions=True)
+
+
+def get_background_key(filters) -> str:
+	"""Identity of a background run: the company and the normalized filters."""
+	return f"{filters.get('company') or ALL_COMPANIES}|{get_filters_hash(filters)}"
+
+
+def get_state_key(key: str) -> str:
+	return f"stock_balance_report_background|{key}"
+
+
+def get_users_key(key: str) -> str:
+	return frappe.cache.make_key(f"stock_balance_report_background|users|{key}")
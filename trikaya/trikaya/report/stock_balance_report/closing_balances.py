@@ -0,0 +1,181 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Rolling month end openings of Stock Balance Report.
+
+Every day the scheduler makes sure each company with stock has a Stock Balance
+Snapshot and a Closing Stock Balance as on the last month end, so a report run
+never scans more than about a month of ledger on top of its opening.
+
+A Closing Stock Balance only serves report runs with exactly the same filters, so
+the report counts the filter combinations of the runs that read the ledger, not the
+ones served from the result cache, in a sorted set, and the most used combinations
+get their own monthly Closing Stock Balance. Counts are
+halved every month, so combinations nobody uses any more drop out.
+"""
+
+import frappe
+from frappe.query_builder.functions import IfNull
+from frappe.utils import add_days, cint, get_first_day, get_last_day, getdate, nowdate
+
+from erpnext.stock.doctype.inventory_dimension.inventory_dimension import get_inventory_dimensions
+
+CLOSING_BALANCE_FILTERS = ("warehouse", "item_code", "item_group", "warehouse_type")
+USAGE_KEY = "stock_balance_report_filter_usage"
+DEFAULT_COMBINATIONS = 10
+
+
+def get_combination_count() -> int:
+	return cint(frappe.conf.get("stock_balance_report_closing_balance_combinations", DEFAULT_COMBINATIONS))
+
+
+def get_closing_balance_filters(filters) -> dict | None:
+	"""Closing Stock Balance filters equivalent to the report `filters`.
+
+	Returns None when no Closing Stock Balance can serve the run, a Closing Stock
+	Balance holds a single value per filter field."""
+	if not filters.get("company"):
+		return None
+
+	closing_balance_filters = {"company": filters.get("company")}
+	for fieldname in CLOSING_BALANCE_FILTERS:
+		value = filters.get(fieldname)
+		if isinstance(value, list | tuple):
+			if len(value) > 1:
+				return None
+
+			value = value[0] if value else None
+
+		closing_balance_filters[fieldname] = value or None
+
+	return closing_balance_filters
+
+
+def record_filter_usage(filters) -> None:
+	closing_balance_filters = get_closing_balance_filters(filters)
+	if not closing_balance_filters or not any(
+		closing_balance_filters[fieldname] for fieldname in CLOSING_BALANCE_FILTERS
+	):
+		# the company wide Closing Stock Balance is always generated
+		return
+
+	member = frappe.as_json(closing_balance_filters, indent=None)
+	frappe.cache.zincrby(get_usage_key(), 1, member)
+
+
+def get_frequent_filters() -> list[dict]:
+	count = get_combination_count()
+	if count <= 0:
+		# zrevrange would read an end of -1 as every recorded combination
+		return []
+
+	combinations = frappe.cache.zrevrange(get_usage_key(), 0, count - 1)
+	return [frappe.parse_json(frappe.safe_decode(combination)) for combination in combinations]
+
+
+def decay_filter_usage() -> None:
+	key = get_usage_key()
+	frappe.cache.zunionstore(key, {key: 0.5})
+	frappe.cache.zremrangebyscore(key, "-inf", 0.5)
+
+
+def generate_closing_balances() -> None:
+	"""Create the month end Stock Balance Snapshots and Closing Stock Balances that are missing."""
+	period_end = get_last_day(add_days(get_first_day(nowdate()), -1))
+	frequent_filters = get_frequent_filters()
+
+	for company in get_stock_companies(period_end):
+		create_snapshot(company, period_end)
+		create_closing_balance({"company": company}, period_end)
+
+		for filters in frequent_filters:
+			if filters.get("company") == company:
+				create_closing_balance(filters, period_end)
+
+	if not frappe.cache.get(get_decay_key(period_end)):
+		decay_filter_usage()
+		frappe.cache.set(get_decay_key(period_end), 1, ex=40 * 24 * 60 * 60)
+
+
+def get_stock_companies(period_end) -> list[str]:
+	companies = frappe.get_all("Company", pluck="name")
+	return [
+		company
+		for company in companies
+		if frappe.db.exists("Stock Ledger Entry", {"company": company, "posting_date": ("<=", period_end)})
+	]
+
+
+def create_snapshot(company: str, period_end) -> None:
+	dimension_wise = [0]
+	if get_inventory_dimensions():
+		dimension_wise.append(1)
+
+	for value in dimension_wise:
+		filters = {"company": company, "period_end": period_end, "dimension_wise": value}
+		if frappe.db.exists("Stock Balance Snapshot", filters):
+			continue
+
+		try:
+			frappe.get_doc({"doctype": "Stock Balance Snapshot", **filters}).insert(ignore_permissions=True)
+			frappe.db.commit()  # nosemgrep
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(f"Stock Balance Snapshot for {company} as on {period_end} failed")
+
+
+def create_closing_balance(filters: dict, period_end) -> None:
+	from_date = get_first_day(period_end)
+	if get_latest_closing_balance_date(filters, from_date):
+		# already generated, or a manual Closing Stock Balance overlaps the month
+		return
+
+	try:
+		doc = frappe.get_doc(
+			{
+				"doctype": "Closing Stock Balance",
+				"from_date": from_date,
+				"to_date": period_end,
+				**filters,
+			}
+		)
+		doc.insert(ignore_permissions=True)
+		doc.submit()
+		frappe.db.commit()  # nosemgrep
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(f"Closing Stock Balance for {frappe.as_json(filters)} as on {period_end} failed")
+
+
+def get_latest_closing_balance_date(filters: dict, from_date):
+	table = frappe.qb.DocType("Closing Stock Balance")
+	query = apply_closing_balance_filters(
+		frappe.qb.from_(table)
+		.select(table.to_date)
+		.where((table.docstatus == 1) & (table.to_date >= getdate(from_date))),
+		table,
+		filters,
+	)
+
+	result = query.limit(1).run()
+	return result[0][0] if result else None
+
+
+def apply_closing_balance_filters(query, table, filters: dict):
+	"""Match Closing Stock Balances with exactly `filters`, empty fields included."""
+	query = query.where(table.company == filters["company"])
+	for fieldname in CLOSING_BALANCE_FILTERS:
+		if value := filters.get(fieldname):
+			query = query.where(table[fieldname] == value)
+		else:
+			query = query.where(IfNull(table[fieldname], "") == "")
+
+	return query
+
+
+def get_usage_key() -> str:
+	return frappe.cache.make_key(USAGE_KEY)
+
+
+def get_decay_key(period_end) -> str:
+	return frappe.cache.make_key(f"{USAGE_KEY}|decayed|{period_end}")
@@ -0,0 +1,141 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Stock balances changed since a watermark, for integrations that poll Stock Balance Report.
+
+The watermark is the latest `creation` of the Stock Ledger Entries seen by the
+previous call. Submitting and cancelling both insert ledger entries, a cancellation
+its reversal, so the item and warehouse pairs with entries created after it are the
+pairs whose balance may have changed. Only those pairs go through
+`StockBalanceReport`, which opens from the usual closing balances and snapshots,
+so a poll costs about as much as the transactions since the previous one. Entries
+are looked up by company and `creation`, which the
+`stock_balance_report_creation_index` covers.
+
+Entries are looked up from `stock_balance_report_delta_overlap` seconds before
+the watermark, so a transaction committed after a later one was seen is not
+missed. The pairs in the overlap are returned again, with the same balances.
+Every returned pair comes with all its current balances, and a pair without any
+balance left comes back as a single zero row. A completed repost rewrites the
+values of existing entries without inserting any, so after one every balance is
+returned and `full_refresh` is set.
+"""
+
+import frappe
+from frappe import _
+from frappe.query_builder.functions import Max
+from frappe.utils import add_to_date, cint, get_datetime, nowdate
+
+from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+DEFAULT_OVERLAP = 5 * 60
+BALANCE_FIELDS = ("company", "item_code", "warehouse", "bal_qty", "bal_val", "val_rate")
+
+
+@frappe.whitelist()
+def get_changed_balances(filters: str | dict | None = None, watermark: str | None = None) -> dict:
+	"""Balances of the pairs with ledger entries after `watermark`, and the watermark for the next call.
+
+	Without a watermark every balance is returned. `filters` takes the report filters,
+	with balances as of `to_date`, today by default."""
+	if not frappe.get_cached_doc("Report", "Stock Balance Report").is_permitted():
+		frappe.throw(_("Not permitted to read Stock Balance Report"), frappe.PermissionError)
+
+	filters = frappe._dict(frappe.parse_json(filters or {}))
+	filters.to_date = filters.to_date or nowdate()
+	filters.from_date = filters.to_date
+	filters.include_zero_stock_items = 1
+
+	# read before the changes, so entries written meanwhile are returned by the next call
+	new_watermark = get_latest_creation(filters.get("company")) or watermark
+
+	full_refresh = not watermark or has_completed_reposts(filters.get("company"), watermark)
+	pairs = None
+	if not full_refresh:
+		pairs = get_changed_pairs(filters, watermark)
+		if not pairs:
+			return {"watermark": new_watermark, "full_refresh": False, "balances": []}
+
+		filters.item_code = sorted({item_code for _company, item_code, _warehouse in pairs})
+		filters.warehouse = sorted({warehouse for _company, _item_code, warehouse in pairs})
+
+	return {
+		"watermark": new_watermark,
+		"full_refresh": full_refresh,
+		"balances": get_balances(filters, pairs),
+	}
+
+
+def get_balances(filters, pairs: set[tuple[str, str, str]] | None) -> list[dict]:
+	report = StockBalanceReport(filters)
+	report.prepare()
+	dimension_fields = report.get_group_by_dimensions()
+
+	balances, returned = [], set()
+	for row in report.get_report_rows():
+		pair = (row.company, row.item_code, row.warehouse)
+		if pairs is not None and pair not in pairs:
+			continue
+
+		returned.add(pair)
+		balances.append({field: row.get(field) for field in (*BALANCE_FIELDS, *dimension_fields)})
+
+	for company, item_code, warehouse in (pairs or set()) - returned:
+		balances.append(
+			{
+				"company": company,
+				"item_code": item_code,
+				"warehouse": warehouse,
+				"bal_qty": 0.0,
+				"bal_val": 0.0,
+				"val_rate": 0.0,
+			}
+		)
+
+	return balances
+
+
+def get_changed_pairs(filters, watermark: str) -> set[tuple[str, str, str]]:
+	"""Item and warehouse pairs matching the report filters with entries created after the watermark."""
+	report = StockBalanceReport(filters)
+	report.inventory_dimensions = report.get_inventory_dimension_fields()
+
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	query = (
+		frappe.qb.from_(sle)
+		.select(sle.company, sle.item_code, sle.warehouse)
+		.distinct()
+		.where(sle.creation >= get_since(watermark))
+	)
+
+	if filters.get("company"):
+		query = query.where(sle.company == filters.get("company"))
+
+	query = report.apply_inventory_dimensions_filters(query, sle)
+	query = report.apply_warehouse_filters(query, sle)
+	query = report.apply_items_filters(query, sle)
+
+	return set(query.run())
+
+
+def has_completed_reposts(company: str | None, watermark: str) -> bool:
+	filters = {"docstatus": 1, "status": "Completed", "modified": (">=", get_since(watermark))}
+	if company:
+		filters["company"] = company
+
+	return bool(frappe.db.exists("Repost Item Valuation", filters))
+
+
+def get_latest_creation(company: str | None) -> str | None:
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	query = frappe.qb.from_(sle).select(Max(sle.creation))
+	if company:
+		query = query.where(sle.company == company)
+
+	latest = query.run()[0][0]
+	return str(latest) if latest else None
+
+
+def get_since(watermark: str):
+	overlap = cint(frappe.conf.get("stock_balance_report_delta_overlap")) or DEFAULT_OVERLAP
+	return add_to_date(get_datetime(watermark), seconds=-overlap)
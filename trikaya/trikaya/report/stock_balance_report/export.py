@@ -0,0 +1,226 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Streaming export of Stock Balance Report.
+
+The standard export builds the whole report data, sends it to the browser and
+serializes it again, which fails for a few hundred thousand rows. Here a long
+queue job takes the report rows one at a time from `get_report_rows`, adds the
+UOM conversion columns chunk by chunk and writes every chunk straight to a
+private file. The user is sent the file URL over realtime once it is written.
+
+Parquet needs `pyarrow`, which is not a dependency of the app.
+"""
+
+import csv
+import os
+from copy import deepcopy
+from itertools import islice
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, cstr, flt, now_datetime
+
+from erpnext.stock.utils import add_additional_uom_columns
+
+from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+CHUNK_SIZE = 10000
+EXPORT_EVENT = "stock_balance_report_export"
+FILE_PREFIX = "stock-balance-export-"
+EXPORT_TTL = 24 * 60 * 60
+NUMERIC_FIELDTYPES = ("Currency", "Float", "Int", "Percent")
+
+
+@frappe.whitelist()
+def export_stock_balance(filters: str | dict, file_format: str = "CSV") -> str:
+	"""Queue the export of the report for `filters`, the file URL follows over realtime."""
+	if not frappe.get_cached_doc("Report", "Stock Balance Report").is_permitted():
+		frappe.throw(_("Not permitted to export Stock Balance Report"), frappe.PermissionError)
+
+	if file_format not in WRITERS:
+		frappe.throw(_("File format must be one of {0}").format(", ".join(WRITERS)))
+
+	filters = frappe._dict(frappe.parse_json(filters))
+	frappe.enqueue(
+		run_export,
+		queue="long",
+		timeout=cint(frappe.conf.get("stock_balance_report_background_timeout")) or 3600,
+		filters=filters,
+		file_format=file_format,
+		user=frappe.session.user,
+	)
+
+	return _("The export has been queued, the download will start once the file is ready.")
+
+
+def run_export(filters: dict, file_format: str, user: str) -> None:
+	try:
+		file_url = export(frappe._dict(filters), file_format)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error("Stock Balance Report export failed")
+		frappe.publish_realtime(EXPORT_EVENT, {"status": "Failed"}, user=user)
+		return
+
+	frappe.publish_realtime(EXPORT_EVENT, {"status": "Completed", "file_url": file_url}, user=user)
+
+
+def export(filters, file_format: str = "CSV") -> str:
+	"""Write the report for `filters` to a private file in chunks and return its URL."""
+	report = StockBalanceReport(filters)
+	report.prepare()
+	rows = report.get_report_rows()
+
+	columns = report.get_columns()
+
+	extension = WRITERS[file_format]["extension"]
+	file_name = f"{FILE_PREFIX}{frappe.generate_hash(length=12)}.{extension}"
+	path = frappe.get_site_path("private", "files", file_name)
+
+	writer = WRITERS[file_format]["writer"](path)
+	try:
+		while chunk := list(islice(rows, CHUNK_SIZE)):
+			chunk_columns = columns
+			if filters.get("include_uom"):
+				# the items of the chunk are known once it is built
+				conversion_factors = report.get_itemwise_conversion_factor()
+
+				# the conversion columns are added next to the convertible ones of every chunk
+				chunk_columns = deepcopy(columns)
+				add_additional_uom_columns(
+					chunk_columns, chunk, filters.get("include_uom"), conversion_factors
+				)
+
+			writer.write(chunk_columns, chunk)
+
+		writer.close(columns)
+	except Exception:
+		if os.path.exists(path):
+			os.remove(path)
+
+		raise
+
+	file = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": file_name,
+			"file_url": f"/private/files/{file_name}",
+			"is_private": 1,
+		}
+	)
+	file.insert(ignore_permissions=True)
+
+	return file.file_url
+
+
+class CSVWriter:
+	def __init__(self, path: str) -> None:
+		self.file = open(path, "w", newline="", encoding="utf-8")
+		self.writer = csv.writer(self.file)
+		self.fieldnames = None
+
+	def write(self, columns: list[dict], rows: list[dict]) -> None:
+		if self.fieldnames is None:
+			self.fieldnames = [column["fieldname"] for column in columns]
+			self.writer.writerow([column.get("label") for column in columns])
+
+		self.writer.writerows([row.get(fieldname) for fieldname in self.fieldnames] for row in rows)
+
+	def close(self, columns: list[dict]) -> None:
+		if self.fieldnames is None:
+			self.write(columns, [])
+
+		self.file.close()
+
+
+class XLSXWriter:
+	def __init__(self, path: str) -> None:
+		from openpyxl import Workbook
+
+		self.path = path
+		self.workbook = Workbook(write_only=True)
+		self.sheet = self.workbook.create_sheet(_("Stock Balance"))
+		self.fieldnames = None
+
+	def write(self, columns: list[dict], rows: list[dict]) -> None:
+		if self.fieldnames is None:
+			self.fieldnames = [column["fieldname"] for column in columns]
+			self.sheet.append([column.get("label") for column in columns])
+
+		for row in rows:
+			self.sheet.append([row.get(fieldname) for fieldname in self.fieldnames])
+
+	def close(self, columns: list[dict]) -> None:
+		if self.fieldnames is None:
+			self.write(columns, [])
+
+		self.workbook.save(self.path)
+
+
+class ParquetWriter:
+	def __init__(self, path: str) -> None:
+		try:
+			import pyarrow
+			import pyarrow.parquet
+		except ImportError:
+			frappe.throw(_("Parquet export needs the pyarrow package to be installed"))
+
+		self.pyarrow = pyarrow
+		self.path = path
+		self.writer = None
+		self.schema = None
+
+	def write(self, columns: list[dict], rows: list[dict]) -> None:
+		if self.writer is None:
+			self.schema = self.get_schema(columns)
+			self.writer = self.pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+		batch = {}
+		for field in self.schema:
+			convert = flt if self.pyarrow.types.is_floating(field.type) else cstr
+			batch[field.name] = [
+				None if row.get(field.name) is None else convert(row.get(field.name)) for row in rows
+			]
+
+		self.writer.write_table(self.pyarrow.Table.from_pydict(batch, schema=self.schema))
+
+	def get_schema(self, columns: list[dict]):
+		return self.pyarrow.schema(
+			(
+				column["fieldname"],
+				self.pyarrow.float64()
+				if column.get("fieldtype") in NUMERIC_FIELDTYPES
+				else self.pyarrow.string(),
+			)
+			for column in columns
+		)
+
+	def close(self, columns: list[dict]) -> None:
+		if self.writer is None:
+			self.write(columns, [])
+
+		self.writer.close()
+
+
+WRITERS = {
+	"CSV": {"extension": "csv", "writer": CSVWriter},
+	"Excel": {"extension": "xlsx", "writer": XLSXWriter},
+	"Parquet": {"extension": "parquet", "writer": ParquetWriter},
+}
+
+
+def delete_expired_exports() -> None:
+	"""Delete export files older than a day."""
+	expired = frappe.get_all(
+		"File",
+		filters={
+			"file_name": ("like", f"{FILE_PREFIX}%"),
+			"is_private": 1,
+			"creation": ("<", add_to_date(now_datetime(), seconds=-EXPORT_TTL)),
+		},
+		pluck="name",
+	)
+
+	for name in expired:
+		frappe.delete_doc("File", name, ignore_permissions=True)
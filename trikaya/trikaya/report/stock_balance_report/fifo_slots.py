@@ -0,0 +1,136 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+from frappe.utils import flt
+
+from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
+
+
+class StreamingFIFOSlots:
+	"""Warehouse wise FIFO queues, updated one ledger entry at a time.
+
+	Follows `erpnext.stock.report.stock_ageing.stock_ageing.FIFOSlots`, which needs the
+	whole ledger as a list. Here the report feeds every entry of its single unbuffered
+	pass, and stock taken out by a voucher (to be put back by the same voucher, e.g. a
+	repack of the same item) is dropped once the ledger moves past its posting time.
+	Memory therefore grows with the number of open FIFO slots, not with ledger rows.
+	"""
+
+	def __init__(self, serial_nos_by_bundle: dict[str, list[str]] | None = None) -> None:
+		self.item_details = {}
+		self.transferred_item_details = {}
+		self.serial_no_batch_purchase_details = {}
+		self.serial_nos_by_bundle = serial_nos_by_bundle or {}
+		self.posting_datetime = None
+
+	def update(self, row) -> None:
+		if row.posting_datetime != self.posting_datetime:
+			self.transferred_item_details.clear()
+			self.posting_datetime = row.posting_datetime
+
+		key = (row.item_code, row.warehouse)
+		details = self.item_details.setdefault(key, {"fifo_queue": [], "qty_after_transaction": 0.0})
+		fifo_queue = details["fifo_queue"]
+
+		transfer_key = (row.voucher_no, row.item_code, row.warehouse)
+		transfer_data = self.transferred_item_details.setdefault(transfer_key, [])
+
+		actual_qty = flt(row.actual_qty)
+		if row.voucher_type == "Stock Reconciliation":
+			# get difference in qty shift as actual qty
+			actual_qty = flt(row.qty_after_transaction) - flt(details["qty_after_transaction"])
+
+		serial_nos = get_serial_nos(row.serial_no) if row.serial_no else []
+		if row.serial_and_batch_bundle and row.has_serial_no:
+			serial_nos = self.serial_nos_by_bundle.get(row.serial_and_batch_bundle) or []
+
+		if actual_qty > 0:
+			self.add_incoming_stock(row, actual_qty, fifo_queue, transfer_data, serial_nos)
+		else:
+			self.remove_outgoing_stock(row, actual_qty, fifo_queue, transfer_data, serial_nos)
+
+		details["qty_after_transaction"] = row.qty_after_transaction
+
+	def add_incoming_stock(self, row, actual_qty, fifo_queue, transfer_data, serial_nos) -> None:
+		if transfer_data:
+			# inward/outward from same voucher, item & warehouse
+			self.return_transferred_stock(row, actual_qty, fifo_queue, transfer_data)
+			return
+
+		if not serial_nos and not row.get("has_serial_no"):
+			if fifo_queue and flt(fifo_queue[0][0]) <= 0:
+				# neutralize 0/negative stock by adding positive stock
+				fifo_queue[0][0] += actual_qty
+				fifo_queue[0][1] = row.posting_date
+				fifo_queue[0][2] += flt(row.stock_value_difference)
+			else:
+				fifo_queue.append([actual_qty, row.posting_date, flt(row.stock_value_difference)])
+
+			return
+
+		valuation = flt(row.stock_value_difference) / actual_qty
+		for serial_no in serial_nos:
+			purchase_date = self.serial_no_batch_purchase_details.setdefault(serial_no, row.posting_date)
+			fifo_queue.append([serial_no, purchase_date, valuation])
+
+	def remove_outgoing_stock(self, row, actual_qty, fifo_queue, transfer_data, serial_nos) -> None:
+		if serial_nos:
+			fifo_queue[:] = [slot for slot in fifo_queue if slot[0] not in serial_nos]
+			return
+
+		qty_to_pop = abs(actual_qty)
+		stock_value = abs(flt(row.stock_value_difference))
+
+		while qty_to_pop:
+			slot = fifo_queue[0] if fifo_queue else [0, None, 0]
+			if 0 < flt(slot[0]) <= qty_to_pop:
+				# consume the whole slot
+				qty_to_pop = flt(qty_to_pop - slot[0])
+				stock_value = flt(stock_value - slot[2])
+				transfer_data.append(fifo_queue.pop(0))
+			elif not fifo_queue:
+				# negative stock, no balance but qty yet to consume
+				fifo_queue.append([-(qty_to_pop), row.posting_date, -(stock_value)])
+				transfer_data.append([qty_to_pop, row.posting_date, stock_value])
+				qty_to_pop = 0
+				stock_value = 0
+			else:
+				# ample balance in the first slot
+				slot[0] = flt(slot[0] - qty_to_pop)
+				slot[2] = flt(slot[2] - stock_value)
+				transfer_data.append([qty_to_pop, slot[1], stock_value])
+				qty_to_pop = 0
+				stock_value = 0
+
+	def return_transferred_stock(self, row, actual_qty, fifo_queue, transfer_data) -> None:
+		"""Add stock taken out earlier by the same voucher back to the FIFO queue."""
+		transfer_qty_to_pop = actual_qty
+		stock_value = flt(row.stock_value_difference)
+
+		def add_to_fifo_queue(slot):
+			if fifo_queue and flt(fifo_queue[0][0]) <= 0:
+				# neutralize 0/negative stock by adding positive stock
+				fifo_queue[0][0] += flt(slot[0])
+				fifo_queue[0][1] = slot[1]
+				fifo_queue[0][2] += flt(slot[2])
+			else:
+				fifo_queue.append(slot)
+
+		while transfer_qty_to_pop:
+			if transfer_data and 0 < transfer_data[0][0] <= transfer_qty_to_pop:
+				# bucket qty is not enough, consume whole
+				transfer_qty_to_pop -= transfer_data[0][0]
+				stock_value -= transfer_data[0][2]
+				add_to_fifo_queue(transfer_data.pop(0))
+			elif not transfer_data:
+				# transfer bucket is empty, extra incoming qty
+				add_to_fifo_queue([transfer_qty_to_pop, row.posting_date, stock_value])
+				transfer_qty_to_pop = 0
+				stock_value = 0
+			else:
+				# ample bucket qty to consume
+				transfer_data[0][0] -= transfer_qty_to_pop
+				transfer_data[0][2] -= stock_value
+				add_to_fifo_queue([transfer_qty_to_pop, transfer_data[0][1], stock_value])
+				transfer_qty_to_pop = 0
+				stock_value = 0
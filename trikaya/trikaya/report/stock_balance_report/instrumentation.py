@@ -0,0 +1,139 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Measurement helpers of Stock Balance Report.
+
+Runs are profiled phase by phase when the `stock_balance_report_instrumentation`
+site config key or the hidden `instrument` filter is set. Profiles go to the
+`stock_balance_report` site log, and runs with the filter also return them as the
+report message.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+
+def is_instrumented(filters) -> bool:
+	return bool(filters.get("instrument") or cint(frappe.conf.get("stock_balance_report_instrumentation")))
+
+
+class QueryCounter:
+	"""Count the queries run through `frappe.db.sql` while the context is active.
+
+	With `record`, the query and values of every call are kept in `queries` as well."""
+
+	def __init__(self, record: bool = False) -> None:
+		self.count = 0
+		self.record = record
+		self.queries = []
+
+	def __enter__(self):
+		self.db = frappe.db
+		self.sql = self.db.sql
+
+		def sql(*args, **kwargs):
+			self.count += 1
+			if self.record:
+				query = args[0] if args else kwargs.get("query")
+				values = args[1] if len(args) > 1 else kwargs.get("values")
+				self.queries.append((str(query), values))
+
+			return self.sql(*args, **kwargs)
+
+		self.db.sql = sql
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.db.sql = self.sql
+
+
+class RunProfiler:
+	"""Time, query count and peak traced memory of the phases of one report run.
+
+	Phases may nest: the figures of a phase include those of the phases inside it."""
+
+	def __init__(self, enabled: bool = False) -> None:
+		self.enabled = enabled
+		self.phases = []
+		self.stack = []
+
+	@contextmanager
+	def phase(self, name: str, accumulate: bool = False):
+		"""Measure the block as phase `name`. Set `rows` on the yielded dict to record a row count.
+
+		With `accumulate`, a block run repeatedly, such as once per chunk, adds up into the
+		phase of the same name and depth instead of listing every run."""
+		details = {}
+		if not self.enabled:
+			yield details
+			return
+
+		started_tracing = not tracemalloc.is_tracing()
+		if started_tracing:
+			tracemalloc.start()
+
+		depth = len(self.stack)
+		phase = None
+		if accumulate:
+			phase = next((d for d in self.phases if d["phase"] == name and d["depth"] == depth), None)
+
+		if phase is None:
+			# listed in the order the phases start, parents before the phases inside them
+			phase = {"phase": name, "depth": depth}
+			self.phases.append(phase)
+
+		tracemalloc.reset_peak()
+		self.stack.append(0)
+		started = time.perf_counter()
+
+		try:
+			with QueryCounter() as counter:
+				yield details
+		finally:
+			seconds = time.perf_counter() - started
+			# nested phases reset the peak, so take the largest peak seen inside this phase
+			peak = max(tracemalloc.get_traced_memory()[1], self.stack.pop())
+			if self.stack:
+				self.stack[-1] = max(self.stack[-1], peak)
+
+			if started_tracing:
+				tracemalloc.stop()
+
+			phase["seconds"] = round(phase.get("seconds", 0) + seconds, 4)
+			phase["queries"] = phase.get("queries", 0) + counter.count
+			phase["peak_memory_mb"] = max(phase.get("peak_memory_mb", 0), round(peak / 1024 / 1024, 2))
+			for key, value in details.items():
+				phase[key] = phase.get(key, 0) + value if accumulate else value
+
+	def log(self, filters) -> None:
+		if not self.enabled:
+			return
+
+		frappe.logger("stock_balance_report", allow_site=True).info(
+			frappe.as_json({"filters": filters, "phases": self.phases}, indent=None)
+		)
+
+	def get_message(self) -> str:
+		rows = "".join(
+			"<tr><td style='padding-left: {}px'>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>".format(
+				12 * phase["depth"],
+				phase["phase"],
+				phase["seconds"],
+				phase["queries"],
+				phase["peak_memory_mb"],
+				phase.get("rows", ""),
+			)
+			for phase in self.phases
+		)
+
+		return (
+			"<details><summary>{}</summary><table class='table table-bordered'>"
+			"<tr><th>{}</th><th>{}</th><th>{}</th><th>{}</th><th>{}</th></tr>{}</table></details>"
+		).format(
+			_("Run Profile"), _("Phase"), _("Seconds"), _("Queries"), _("Peak Memory (MB)"), _("Rows"), rows
+		)
@@ -0,0 +1,112 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Item master data of Stock Balance Report, cached in the worker process.
+
+The ledger is scanned without joining Item, and the name, group, stock UOM, UOM
+conversion factors and variant attributes of the items in the report are looked
+up here once the rows are aggregated. Items are loaded in batches and kept per
+site until the cache holds `MAX_CACHED_ITEMS` items. A version in redis, bumped by
+the Item and Item Group doc events, drops the cache whenever an item or one of its
+UOM conversion or variant attribute rows changes, or an item group is renamed or
+merged.
+"""
+
+import frappe
+from frappe.utils import cint
+
+BATCH_SIZE = 1000
+MAX_CACHED_ITEMS = 200000
+
+_item_cache = {}
+
+
+def get_item_details(item_codes) -> dict[str, frappe._dict]:
+	"""Master data of the given items, by item code. Items that do not exist are left out."""
+	cache = get_site_cache()
+
+	details, missing = {}, []
+	for item_code in set(item_codes):
+		if item_code in cache:
+			details[item_code] = cache[item_code]
+		else:
+			missing.append(item_code)
+
+	loaded = {}
+	for start in range(0, len(missing), BATCH_SIZE):
+		loaded.update(load_item_details(missing[start : start + BATCH_SIZE]))
+
+	details.update(loaded)
+
+	if len(cache) + len(loaded) > MAX_CACHED_ITEMS:
+		cache.clear()
+
+	if len(loaded) <= MAX_CACHED_ITEMS:
+		cache.update(loaded)
+
+	return details
+
+
+def load_item_details(item_codes: list[str]) -> dict[str, frappe._dict]:
+	item_table = frappe.qb.DocType("Item")
+	uom_table = frappe.qb.DocType("UOM Conversion Detail")
+	attribute_table = frappe.qb.DocType("Item Variant Attribute")
+
+	items = (
+		frappe.qb.from_(item_table)
+		.select(item_table.name, item_table.item_name, item_table.item_group, item_table.stock_uom)
+		.where(item_table.name.isin(item_codes))
+	).run()
+
+	details = {}
+	for item_code, item_name, item_group, stock_uom in items:
+		details[item_code] = frappe._dict(
+			item_name=item_name,
+			item_group=item_group,
+			stock_uom=stock_uom,
+			conversion_factors={},
+			variant_attributes={},
+		)
+
+	conversion_factors = (
+		frappe.qb.from_(uom_table)
+		.select(uom_table.parent, uom_table.uom, uom_table.conversion_factor)
+		.where((uom_table.parenttype == "Item") & uom_table.parent.isin(item_codes))
+	).run()
+
+	for item_code, uom, conversion_factor in conversion_factors:
+		if item_code in details:
+			details[item_code].conversion_factors[uom] = conversion_factor
+
+	variant_attributes = (
+		frappe.qb.from_(attribute_table)
+		.select(attribute_table.parent, attribute_table.attribute, attribute_table.attribute_value)
+		.where((attribute_table.parenttype == "Item") & attribute_table.parent.isin(item_codes))
+	).run()
+
+	for item_code, attribute, attribute_value in variant_attributes:
+		if item_code in details:
+			details[item_code].variant_attributes[attribute] = attribute_value
+
+	return details
+
+
+def get_site_cache() -> dict[str, frappe._dict]:
+	version = get_version()
+	cached = _item_cache.get(frappe.local.site)
+	if not cached or cached[0] != version:
+		cached = _item_cache[frappe.local.site] = (version, {})
+
+	return cached[1]
+
+
+def invalidate() -> None:
+	frappe.cache.incr(get_version_key())
+
+
+def get_version() -> int:
+	return cint(frappe.cache.get(get_version_key()))
+
+
+def get_version_key() -> str:
+	return frappe.cache.make_key("stock_balance_report_item_master_version")
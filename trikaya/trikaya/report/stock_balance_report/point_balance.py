@@ -0,0 +1,204 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Balance of single items in single warehouses at a date, without running the report.
+
+The balance opens from the latest completed Stock Balance Snapshot of the company
+up to the date, and only the ledger entries of the requested item and warehouse
+pairs after the snapshot are added, through the item code index. They go through
+the `StockBalanceReport` aggregation itself, so reconciliations and rounding match
+the report. Pairs are grouped by company and dimensions and looked up in batches,
+so one call can return the balances of many pairs.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.query_builder import Order
+from frappe.query_builder.functions import IfNull
+from frappe.utils import cint, flt, getdate, nowdate
+from pypika.terms import Tuple
+
+from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+BATCH_SIZE = 500
+
+
+@frappe.whitelist()
+def get_balance(
+	item_code: str | None = None,
+	warehouse: str | None = None,
+	as_of: str | None = None,
+	dimensions: str | dict | None = None,
+	pairs: str | list | None = None,
+) -> dict | list[dict]:
+	"""Quantity, value and valuation rate of `item_code` in `warehouse` at the end of `as_of`.
+
+	`as_of` is today by default. `dimensions` restricts the balance to inventory dimension
+	values, such as {"project": "PROJ-0001"}. For many balances in one call pass `pairs`,
+	a list of dicts with `item_code`, `warehouse` and optionally `dimensions`, and get a
+	list of balances in the same order."""
+	if not frappe.get_cached_doc("Report", "Stock Balance Report").is_permitted():
+		frappe.throw(_("Not permitted to read Stock Balance Report"), frappe.PermissionError)
+
+	as_of = getdate(as_of or nowdate())
+	if pairs is None:
+		request = {"item_code": item_code, "warehouse": warehouse, "dimensions": dimensions}
+		return get_balances([request], as_of)[0]
+
+	return get_balances(frappe.parse_json(pairs), as_of)
+
+
+def get_balances(requests: list[dict], as_of) -> list[dict]:
+	dimension_fields = set(StockBalanceReport.get_inventory_dimension_fields())
+
+	keys, groups = [], {}
+	for request in requests:
+		request = frappe._dict(request)
+		dimensions = frappe.parse_json(request.dimensions or {})
+		if unknown := set(dimensions) - dimension_fields:
+			frappe.throw(_("{0} is not an inventory dimension").format(", ".join(sorted(unknown))))
+
+		if not request.item_code or not frappe.db.exists("Item", request.item_code, cache=True):
+			frappe.throw(_("Item {0} does not exist").format(request.item_code), frappe.DoesNotExistError)
+
+		company = frappe.get_cached_value("Warehouse", request.warehouse, "company")
+		if not company:
+			frappe.throw(
+				_("Warehouse {0} does not exist").format(request.warehouse), frappe.DoesNotExistError
+			)
+
+		group = (company, tuple(sorted(dimensions.items())))
+		keys.append((group, request.item_code, request.warehouse))
+		groups.setdefault(group, set()).add((request.item_code, request.warehouse))
+
+	balances = {}
+	for group, pairs in groups.items():
+		company, dimensions = group
+		for pair, balance in get_group_balances(company, dict(dimensions), list(pairs), as_of).items():
+			balances[(group, *pair)] = balance
+
+	return [balances[key] for key in keys]
+
+
+def get_group_balances(company: str, dimensions: dict, pairs: list[tuple[str, str]], as_of) -> dict:
+	"""Balances by `(item_code, warehouse)` of pairs of one company with the same dimensions."""
+	report = StockBalanceReport(frappe._dict(company=company, from_date=as_of, to_date=as_of))
+	report.float_precision = cint(frappe.db.get_default("float_precision")) or 3
+	report.inventory_dimensions = []
+	report.opening_vouchers = {}
+
+	snapshot = get_snapshot(company, as_of, dimension_wise=bool(dimensions))
+	report.opening_data = get_snapshot_balances(snapshot, company, dimensions, pairs) if snapshot else {}
+
+	item_warehouse_map = {}
+	for start in range(0, len(pairs), BATCH_SIZE):
+		query = get_ledger_query(report, snapshot, dimensions, pairs[start : start + BATCH_SIZE])
+		for entry in query.run(as_dict=True):
+			key = (entry.company, entry.item_code, entry.warehouse)
+			if key not in item_warehouse_map:
+				report.initialize_data(item_warehouse_map, key, entry)
+
+			report.prepare_item_warehouse_map(item_warehouse_map, entry, key)
+
+	precision = report.float_precision
+	balances = {}
+	for item_code, warehouse in pairs:
+		key = (company, item_code, warehouse)
+		row = item_warehouse_map.get(key) or report.opening_data.get(key) or {}
+		balances[(item_code, warehouse)] = {
+			"item_code": item_code,
+			"warehouse": warehouse,
+			"dimensions": dimensions,
+			"as_of": as_of,
+			"bal_qty": flt(row.get("bal_qty"), precision),
+			"bal_val": flt(row.get("bal_val"), precision),
+			"val_rate": flt(row.get("val_rate"), precision),
+		}
+
+	return balances
+
+
+def get_ledger_query(report: StockBalanceReport, snapshot, dimensions: dict, pairs: list[tuple[str, str]]):
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	query = (
+		frappe.qb.from_(sle)
+		.select(*report.get_ledger_fields(sle))
+		.where(
+			(sle.docstatus < 2)
+			& (sle.is_cancelled == 0)
+			& (sle.company == report.filters.company)
+			& (sle.posting_date <= report.to_date)
+			& Tuple(sle.item_code, sle.warehouse).isin([Tuple(*pair) for pair in pairs])
+		)
+		.orderby(sle.posting_datetime)
+		.orderby(sle.creation)
+	)
+
+	if snapshot:
+		query = query.where(sle.posting_date > snapshot.period_end)
+
+	for fieldname, value in dimensions.items():
+		query = query.where(sle[fieldname] == value)
+
+	return query
+
+
+def get_snapshot(company: str, as_of, dimension_wise: bool):
+	"""Latest completed ledger snapshot of the company up to `as_of`, split by dimension if needed."""
+	table = frappe.qb.DocType("Stock Balance Snapshot")
+	snapshot = (
+		frappe.qb.from_(table)
+		.select(table.name, table.period_end)
+		.where(
+			(table.company == company)
+			& (table.period_end <= as_of)
+			& (table.dimension_wise == cint(dimension_wise))
+			& (table.status == "Completed")
+			& (IfNull(table.closing_stock_balance, "") == "")
+		)
+		.orderby(table.period_end, order=Order.desc)
+		.limit(1)
+	).run(as_dict=True)
+
+	return snapshot[0] if snapshot else None
+
+
+def get_snapshot_balances(snapshot, company: str, dimensions: dict, pairs: list[tuple[str, str]]) -> dict:
+	"""Opening data of the report from the snapshot rows of the pairs matching `dimensions`."""
+	entry_table = frappe.qb.DocType("Stock Balance Snapshot Entry")
+
+	opening_data = {}
+	for start in range(0, len(pairs), BATCH_SIZE):
+		batch = pairs[start : start + BATCH_SIZE]
+		entries = (
+			frappe.qb.from_(entry_table)
+			.select(
+				entry_table.item_code,
+				entry_table.warehouse,
+				entry_table.inventory_dimensions,
+				entry_table.bal_qty,
+				entry_table.bal_val,
+				entry_table.val_rate,
+			)
+			.where(
+				(entry_table.snapshot == snapshot.name)
+				& Tuple(entry_table.item_code, entry_table.warehouse).isin([Tuple(*pair) for pair in batch])
+			)
+		).run(as_dict=True)
+
+		for entry in entries:
+			if dimensions:
+				# dimension wise snapshots hold one row per combination, add up those matching
+				entry_dimensions = json.loads(entry.inventory_dimensions or "{}")
+				if any(entry_dimensions.get(field) != value for field, value in dimensions.items()):
+					continue
+
+			key = (company, entry.item_code, entry.warehouse)
+			opening = opening_data.setdefault(key, frappe._dict(bal_qty=0.0, bal_val=0.0, val_rate=0.0))
+			opening.bal_qty += flt(entry.bal_qty)
+			opening.bal_val += flt(entry.bal_val)
+			opening.val_rate = flt(entry.val_rate)
+
+	return opening_data
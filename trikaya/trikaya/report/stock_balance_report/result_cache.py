@@ -0,0 +1,262 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Result cache of Stock Balance Report.
+
+Results are keyed by a hash of the normalized filters and by a ledger watermark of
+the filtered company: the latest Closing Stock Balance and a version counter kept
+in redis. Every submitted Stock Ledger Entry bumps the version of its company once
+its transaction commits. That covers cancellations too, since ERPNext cancels
+entries with an update and submits reversal entries, which are cancelled already.
+Completed reposts rewrite existing entries and bump the version through doc events.
+Rows also carry Item, Item Group and Warehouse master data, so changes to those
+bump a master data version that is part of every watermark.
+
+Cached results are tracked in a sorted set by last access, which bounds the cache
+to `stock_balance_report_cache_size` entries with least recently used eviction.
+
+Identical requests that miss the cache at the same time are coalesced: the first
+takes a redis lock and builds the result, the others wait for it to be stored.
+"""
+
+import hashlib
+import json
+import time
+
+import frappe
+from frappe.utils import cint
+
+CACHE_PREFIX = "stock_balance_report_cache"
+ALL_COMPANIES = "*"
+MASTER_DATA = "master_data"
+DEFAULT_CACHE_SIZE = 100
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_LOCK_TIMEOUT = 10 * 60
+DEFAULT_WAIT_TIMEOUT = 60
+POLL_INTERVAL = 0.2
+MAX_POLL_INTERVAL = 2
+
+
+def is_enabled() -> bool:
+	return bool(cint(frappe.conf.get("stock_balance_report_cache", 1)))
+
+
+def get_cache_size() -> int:
+	return cint(frappe.conf.get("stock_balance_report_cache_size")) or DEFAULT_CACHE_SIZE
+
+
+def get_cached_result(filters, generator):
+	"""Return the cached report result for `filters`, or build it with `generator` and cache it."""
+	if not is_enabled():
+		return generator()
+
+	key = get_result_key(filters)
+	result = get_result(key)
+	if result is not None:
+		record("hits")
+		return result
+
+	record("misses")
+	return build_once(key, generator)
+
+
+def build_once(key: str, generator):
+	"""Build the result of `key` in one request, identical requests wait for it.
+
+	The lock expires after `stock_balance_report_lock_timeout` seconds, so a worker that
+	dies while building does not block the key. Waiters take over as soon as the lock
+	is gone without a result, and build the result themselves after waiting
+	`stock_balance_report_wait_timeout` seconds."""
+	token = frappe.generate_hash()
+	deadline = time.monotonic() + get_wait_timeout()
+	interval = POLL_INTERVAL
+
+	while not acquire(key, token):
+		if time.monotonic() >= deadline:
+			record("wait_timeouts")
+			result = generator()
+			store(key, result)
+			return result
+
+		time.sleep(interval)
+		interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+		result = get_result(key)
+		if result is not None:
+			record("coalesced")
+			return result
+
+	try:
+		# the previous holder may have stored the result after the last check
+		result = get_result(key)
+		if result is None:
+			result = generator()
+			store(key, result)
+	finally:
+		release(key, token)
+
+	return result
+
+
+def acquire(key: str, token: str) -> bool:
+	return bool(frappe.cache.set(get_lock_key(key), token, nx=True, ex=get_lock_timeout()))
+
+
+def release(key: str, token: str) -> None:
+	lock_key = get_lock_key(key)
+	# the lock may have expired and been taken by another request
+	if frappe.safe_decode(frappe.cache.get(lock_key)) == token:
+		frappe.cache.delete(lock_key)
+
+
+def get_lock_timeout() -> int:
+	return cint(frappe.conf.get("stock_balance_report_lock_timeout")) or DEFAULT_LOCK_TIMEOUT
+
+
+def get_wait_timeout() -> int:
+	return cint(frappe.conf.get("stock_balance_report_wait_timeout")) or DEFAULT_WAIT_TIMEOUT
+
+
+def get_result(key: str):
+	result = frappe.cache.get_value(get_entry_key(key), expires=True)
+	if result is not None:
+		touch(key)
+
+	return result
+
+
+def get_result_key(filters) -> str:
+	"""Identity of a report result: the company, the normalized filters and the ledger watermark."""
+	company = filters.get("company") or ALL_COMPANIES
+	return "|".join((company, get_filters_hash(filters), get_watermark(filters.get("company"))))
+
+
+def get_filters_hash(filters) -> str:
+	normalized = {}
+	for fieldname, value in filters.items():
+		if value in (None, "", 0, "0") or value == []:
+			continue
+
+		if isinstance(value, list | tuple):
+			value = sorted(str(d) for d in value)
+
+		normalized[fieldname] = value
+
+	# column labels are translated
+	normalized["_lang"] = frappe.local.lang
+	return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_watermark(company: str | None = None) -> str:
+	closing_balance_filters = {"docstatus": 1, "status": "Completed"}
+	if company:
+		closing_balance_filters["company"] = company
+
+	last_closing_balance = frappe.db.get_value(
+		"Closing Stock Balance", closing_balance_filters, "name", order_by="creation desc"
+	)
+
+	watermark = (
+		f"{last_closing_balance}|{get_version(company or ALL_COMPANIES)}|{get_version(MASTER_DATA)}"
+	)
+	return hashlib.sha256(watermark.encode()).hexdigest()[:16]
+
+
+def store(key: str, result) -> None:
+	frappe.cache.set_value(get_entry_key(key), result, expires_in_sec=DEFAULT_CACHE_TTL)
+	touch(key)
+
+	index = get_index_key()
+	excess = frappe.cache.zcard(index) - get_cache_size()
+	if excess > 0:
+		for evicted in frappe.cache.zrange(index, 0, excess - 1):
+			evict(frappe.safe_decode(evicted))
+
+
+def touch(key: str) -> None:
+	frappe.cache.zadd(get_index_key(), {key: time.time()})
+
+
+def evict(key: str) -> None:
+	frappe.cache.delete_value(get_entry_key(key))
+	frappe.cache.zrem(get_index_key(), key)
+
+
+def invalidate(company: str) -> None:
+	"""Drop the cached results of `company` and of runs across all companies."""
+	for scope in (company, ALL_COMPANIES):
+		frappe.cache.incr(get_version_key(scope))
+
+	prefixes = (f"{company}|", f"{ALL_COMPANIES}|")
+	for key in frappe.cache.zrange(get_index_key(), 0, -1):
+		key = frappe.safe_decode(key)
+		if key.startswith(prefixes):
+			evict(key)
+
+
+def invalidate_after_commit(company: str) -> None:
+	"""Move the watermark of `company` once the current transaction commits.
+
+	Bumped after the commit, a run reading the ledger meanwhile caches its result under
+	the old watermark. A company is bumped once per transaction, however many ledger
+	entries it writes."""
+	pending = frappe.flags.setdefault("stock_balance_report_pending_versions", set())
+	if company in pending:
+		return
+
+	pending.add(company)
+
+	def bump_versions():
+		pending.discard(company)
+		for scope in (company, ALL_COMPANIES):
+			frappe.cache.incr(get_version_key(scope))
+
+	frappe.db.after_commit.add(bump_versions)
+	frappe.db.after_rollback.add(lambda: pending.discard(company))
+
+
+def invalidate_master_data_after_commit() -> None:
+	"""Move the watermark of every company once the current transaction commits."""
+	invalidate_after_commit(MASTER_DATA)
+
+
+def get_version(scope: str) -> int:
+	return cint(frappe.cache.get(get_version_key(scope)))
+
+
+def record(counter: str) -> None:
+	frappe.cache.incr(get_counter_key(counter))
+
+
+@frappe.whitelist()
+def get_cache_stats() -> dict:
+	frappe.only_for(("System Manager", "Stock Manager"))
+
+	return {
+		"hits": cint(frappe.cache.get(get_counter_key("hits"))),
+		"misses": cint(frappe.cache.get(get_counter_key("misses"))),
+		"coalesced": cint(frappe.cache.get(get_counter_key("coalesced"))),
+		"wait_timeouts": cint(frappe.cache.get(get_counter_key("wait_timeouts"))),
+		"entries": frappe.cache.zcard(get_index_key()),
+		"size": get_cache_size(),
+	}
+
+
+def get_entry_key(key: str) -> str:
+	return f"{CACHE_PREFIX}|entry|{key}"
+
+
+def get_lock_key(key: str) -> str:
+	return frappe.cache.make_key(f"{CACHE_PREFIX}|lock|{key}")
+
+
+def get_index_key() -> str:
+	return frappe.cache.make_key(f"{CACHE_PREFIX}|index")
+
+
+def get_counter_key(counter: str) -> str:
+	return frappe.cache.make_key(f"{CACHE_PREFIX}|stats|{counter}")
+
+
+def get_version_key(scope: str) -> str:
+	return frappe.cache.make_key(f"{CACHE_PREFIX}|version|{scope}")
@@ -0,0 +1,171 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Subtotal rows of Stock Balance Report, by company and by warehouse, item group or item.
+
+With the `rollup` filter set, the report rows are added up while they are emitted
+into a company row and a row for each warehouse, item group or item of the company,
+keyed by a prefix of the group by key: `(company,)` and `(company, value)`. Each row
+is placed under its subtotal, so the report renders as a tree, and the total row
+adds up the company rows only.
+
+With `rollup_collapsed` set, only the subtotal rows are returned. The rows of one
+subtotal are loaded with `get_rollup_rows` when it is expanded, so a large report
+opens without sending every row to the browser.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cstr, flt
+
+from trikaya.trikaya.report.stock_balance_report.result_cache import get_cached_result
+
+ROLLUP_FIELDS = {"Warehouse": "warehouse", "Item Group": "item_group", "Item": "item_code"}
+SUMMED_FIELDTYPES = ("Float", "Currency")
+
+
+class Rollup:
+	"""Company and level subtotals of the report rows, with the rows placed under them."""
+
+	def __init__(self, level: str, columns: list[dict], precision: int, collapsed: bool = False) -> None:
+		self.fieldname = ROLLUP_FIELDS[level]
+		self.precision = precision
+		self.collapsed = collapsed
+		# the valuation rate of a subtotal is not the sum of the rates of its rows
+		self.summed_fields = [
+			column["fieldname"]
+			for column in columns
+			if column.get("fieldtype") in SUMMED_FIELDTYPES and column["fieldname"] != "val_rate"
+		]
+
+		self.companies = {}
+		self.groups = {}
+		self.rows = {}
+
+	def add(self, row) -> None:
+		company_key = (row.company,)
+		group_key = (row.company, cstr(row.get(self.fieldname)))
+
+		self.add_to(self.companies, company_key, row)
+		self.add_to(self.groups, group_key, row)
+
+		if not self.collapsed:
+			row.indent = 2
+			row.rollup_parent = get_rollup_name(group_key)
+			self.rows.setdefault(group_key, []).append(row)
+
+	def add_to(self, subtotals: dict, key: tuple, row) -> None:
+		if key not in subtotals:
+			subtotals[key] = self.get_subtotal_row(key, row)
+
+		subtotal = subtotals[key]
+		for fieldname in self.summed_fields:
+			subtotal[fieldname] += flt(row.get(fieldname))
+
+	def get_subtotal_row(self, key: tuple, row) -> frappe._dict:
+		subtotal = frappe._dict(
+			company=row.company,
+			currency=row.currency,
+			rollup_name=get_rollup_name(key),
+			rollup_parent=None,
+			rollup_label=row.company,
+			is_rollup=1,
+			indent=0,
+		)
+
+		if len(key) > 1:
+			subtotal[self.fieldname] = key[1]
+			subtotal.rollup_parent = get_rollup_name(key[:1])
+			subtotal.rollup_label = key[1] or _("Not Set")
+			subtotal.indent = 1
+
+			if self.fieldname == "item_code":
+				subtotal.item_name = row.item_name
+				subtotal.item_group = row.item_group
+				subtotal.stock_uom = row.stock_uom
+
+		subtotal.update(dict.fromkeys(self.summed_fields, 0.0))
+		return subtotal
+
+	def get_rows(self, report_rows) -> list[frappe._dict]:
+		"""Subtotal rows of `report_rows`, each followed by its own rows unless collapsed."""
+		for row in report_rows:
+			self.add(row)
+
+		groups_by_company = {}
+		for key in sorted(self.groups):
+			groups_by_company.setdefault(key[:1], []).append(key)
+
+		data = []
+		for company_key in sorted(self.companies):
+			data.append(self.round(self.companies[company_key]))
+
+			for group_key in groups_by_company[company_key]:
+				data.append(self.round(self.groups[group_key]))
+				data.extend(self.rows.get(group_key, []))
+
+		return data
+
+	def round(self, subtotal: frappe._dict) -> frappe._dict:
+		for fieldname in self.summed_fields:
+			subtotal[fieldname] = flt(subtotal[fieldname], self.precision)
+
+		return subtotal
+
+
+def get_rollup_name(key: tuple) -> str:
+	return json.dumps(list(key))
+
+
+@frappe.whitelist()
+def get_rollup_rows(filters: str | dict, rollup_name: str) -> list[dict]:
+	"""Rows of the subtotal `rollup_name` of a collapsed Stock Balance Report run."""
+	from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+	if not frappe.get_cached_doc("Report", "Stock Balance Report").is_permitted():
+		frappe.throw(_("Not permitted to read Stock Balance Report"), frappe.PermissionError)
+
+	filters = frappe._dict(frappe.parse_json(filters))
+	fieldname = ROLLUP_FIELDS.get(filters.get("rollup"))
+	key = json.loads(rollup_name)
+	if not fieldname or len(key) != 2:
+		frappe.throw(_("Only the rows of a {0} subtotal can be loaded").format(_(filters.get("rollup"))))
+
+	company, value = key
+	filters.company = company
+	filters.rollup = None
+	filters.rollup_collapsed = 0
+	if fieldname == "item_group":
+		# the item group filter takes the whole subtree, only the items of the group itself are
+		# wanted, and the subtotal of items without a group is narrowed to those items too
+		item_codes = frappe.get_all("Item", filters={"item_group": value or ("is", "not set")}, pluck="name")
+		if filters.get("item_code"):
+			item_codes = sorted(set(item_codes) & set(filters.item_code))
+
+		if not item_codes:
+			return []
+
+		filters.item_group = None
+		filters.item_code = item_codes
+	elif value:
+		filters[fieldname] = [value]
+	else:
+		# ledger entries always have a warehouse and an item
+		return []
+
+	report = StockBalanceReport(filters)
+	# expanding a subtotal again, or by another user, reads the cached run
+	_columns, data = get_cached_result(filters, report.run)[:2]
+
+	rows = []
+	for row in data:
+		if cstr(row.get(fieldname)) != value:
+			continue
+
+		row.indent = 2
+		row.rollup_parent = rollup_name
+		rows.append(row)
+
+	return rows
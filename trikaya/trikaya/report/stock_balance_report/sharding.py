@@ -0,0 +1,123 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Sharded execution of Stock Balance Report.
+
+The group by key of the report always contains the warehouse, so partial item
+warehouse maps built over disjoint sets of warehouses never share a key and are
+merged by concatenating them in shard order.
+
+Shards are queued as background jobs on the long queue. Only runs outside web
+requests are sharded, such as background report runs and exports, so no web
+worker waits on shard jobs. The worker running the report builds the first shard
+itself and then steals every shard no worker has claimed yet, so the report still
+completes when no other background worker is free.
+"""
+
+import time
+
+import frappe
+from frappe.utils import cint
+
+from trikaya.trikaya.report.stock_balance_report.tree_filters import get_tree_criterion
+
+SHARD_RESULT_TTL = 15 * 60
+POLL_INTERVAL = 0.2
+
+
+def get_shard_count() -> int:
+	return cint(frappe.conf.get("stock_balance_report_shards"))
+
+
+def get_shard_timeout() -> int:
+	return cint(frappe.conf.get("stock_balance_report_shard_timeout")) or 600
+
+
+def get_warehouse_shards(report, shard_count: int) -> list[list[str]]:
+	"""Split the leaf warehouses matching the report filters round-robin into `shard_count` lists."""
+	warehouse = frappe.qb.DocType("Warehouse")
+	query = frappe.qb.from_(warehouse).select(warehouse.name).where(warehouse.is_group == 0)
+
+	if company := report.filters.get("company"):
+		query = query.where(warehouse.company == company)
+
+	if selected := report.filters.get("warehouse"):
+		query = query.where(get_tree_criterion(warehouse, "Warehouse", selected))
+
+	elif warehouse_type := report.filters.get("warehouse_type"):
+		query = query.where(warehouse.warehouse_type == warehouse_type)
+
+	warehouses = sorted(query.run(pluck=True))
+
+	shards = [warehouses[index::shard_count] for index in range(shard_count)]
+	return [shard for shard in shards if shard]
+
+
+def aggregate_in_shards(report, shards: list[list[str]]) -> dict:
+	run_id = frappe.generate_hash(length=12)
+	filters = dict(report.filters)
+
+	for index, warehouses in enumerate(shards[1:], start=1):
+		frappe.enqueue(
+			run_shard,
+			queue="long",
+			timeout=get_shard_timeout(),
+			filters=filters,
+			warehouses=warehouses,
+			run_id=run_id,
+			index=index,
+		)
+
+	results = {}
+	if claim_shard(run_id, 0):
+		results[0] = get_shard_item_warehouse_map(filters, shards[0])
+
+	deadline = time.monotonic() + get_shard_timeout()
+	while len(results) < len(shards):
+		for index, warehouses in enumerate(shards):
+			if index in results:
+				continue
+
+			partial = frappe.cache.get_value(get_result_key(run_id, index), expires=True)
+			if partial is not None:
+				results[index] = partial
+
+			elif claim_shard(run_id, index) or time.monotonic() > deadline:
+				# no worker picked the shard up, or the one that did never reported back
+				results[index] = get_shard_item_warehouse_map(filters, warehouses)
+
+		if len(results) < len(shards):
+			time.sleep(POLL_INTERVAL)
+
+	item_warehouse_map = {}
+	for index in range(len(shards)):
+		item_warehouse_map.update(results[index])
+		frappe.cache.delete_value(get_result_key(run_id, index))
+
+	return item_warehouse_map
+
+
+def run_shard(filters: dict, warehouses: list[str], run_id: str, index: int) -> None:
+	if not claim_shard(run_id, index):
+		return
+
+	frappe.cache.set_value(
+		get_result_key(run_id, index),
+		get_shard_item_warehouse_map(filters, warehouses),
+		expires_in_sec=SHARD_RESULT_TTL,
+	)
+
+
+def get_shard_item_warehouse_map(filters: dict, warehouses: list[str]) -> dict:
+	from trikaya.trikaya.report.stock_balance_report.stock_balance_report import StockBalanceReport
+
+	return StockBalanceReport(frappe._dict(filters)).get_shard_item_warehouse_map(warehouses)
+
+
+def claim_shard(run_id: str, index: int) -> bool:
+	key = frappe.cache.make_key(f"stock_balance_report_shard_claim|{run_id}|{index}")
+	return bool(frappe.cache.set(key, 1, ex=SHARD_RESULT_TTL, nx=True))
+
+
+def get_result_key(run_id: str, index: int) -> str:
+	return f"stock_balance_report_shard|{run_id}|{index}"
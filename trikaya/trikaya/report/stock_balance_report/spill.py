@@ -0,0 +1,146 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Item warehouse map of Stock Balance Report that spills to disk.
+
+Dimension wise runs over several inventory dimensions can build millions of group
+by keys. With `stock_balance_report_memory_budget_mb` set, runs estimated to build
+more rows than fit the budget keep at most that many rows in memory through the
+opening balances and the streaming aggregation. When the map is full, every row is
+written to a temporary SQLite file and the memory is freed.
+A key seen again later is read back, so Stock Reconciliation entries still start
+from the running balance of their row. Once the ledger is aggregated, the report
+rows are read back one at a time in the order the keys were first seen.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+
+import frappe
+from frappe.utils import cint
+
+# a slotted row with its dimensions, its key tuple and its slot in the dict
+ESTIMATED_ROW_BYTES = 1024
+BATCH_SIZE = 10000
+
+
+def get_max_rows() -> int:
+	"""Rows the map may hold in memory, 0 when no memory budget is configured."""
+	budget_mb = cint(frappe.conf.get("stock_balance_report_memory_budget_mb"))
+	return max(budget_mb * 1024 * 1024 // ESTIMATED_ROW_BYTES, 1) if budget_mb else 0
+
+
+def encode_key(key: tuple) -> str:
+	# pickle memoizes by object identity, so equal keys may pickle to different bytes
+	return json.dumps(key)
+
+
+def decode_key(key: str) -> tuple:
+	return tuple(json.loads(key))
+
+
+class SpillingRowMap:
+	"""Mapping of group by key to row, bounded to `max_rows` rows in memory."""
+
+	def __init__(self, max_rows: int) -> None:
+		self.max_rows = max_rows
+		self.rows = {}
+		self.sequence = {}
+		self.next_sequence = 0
+		self.spills = 0
+
+		fd, self.path = tempfile.mkstemp(prefix="stock-balance-", suffix=".sqlite3")
+		os.close(fd)
+
+		self.connection = sqlite3.connect(self.path)
+		self.connection.execute("pragma journal_mode = off")
+		self.connection.execute("pragma synchronous = off")
+		# rows are read back in sequence order, which walks the rowid
+		self.connection.execute("create table rows (sequence integer primary key, key text unique, row blob)")
+
+	def __contains__(self, key) -> bool:
+		if key in self.rows:
+			return True
+
+		if not self.spills:
+			return False
+
+		# a spilled row comes back to memory, its next entries are added to it
+		spilled = self.connection.execute(
+			"select sequence, row from rows where key = ?", (encode_key(key),)
+		).fetchone()
+		if not spilled:
+			return False
+
+		self.make_room()
+		self.sequence[key] = spilled[0]
+		self.rows[key] = pickle.loads(spilled[1])
+		return True
+
+	def __getitem__(self, key):
+		return self.rows[key]
+
+	def __setitem__(self, key, row) -> None:
+		if key not in self.rows:
+			self.make_room()
+			self.sequence[key] = self.next_sequence
+			self.next_sequence += 1
+
+		self.rows[key] = row
+
+	def __len__(self) -> int:
+		self.spill()
+		return self.connection.execute("select count(*) from rows").fetchone()[0]
+
+	def __iter__(self):
+		for key, _row in self.items():
+			yield key
+
+	def keys(self):
+		return iter(self)
+
+	def values(self):
+		for _key, row in self.items():
+			yield row
+
+	def items(self):
+		self.spill()
+		cursor = self.connection.execute("select key, row from rows order by sequence")
+		while batch := cursor.fetchmany(BATCH_SIZE):
+			for key, row in batch:
+				yield decode_key(key), pickle.loads(row)
+
+	def make_room(self) -> None:
+		if len(self.rows) >= self.max_rows:
+			self.spill()
+
+	def spill(self) -> None:
+		"""Write the rows in memory to the file and free them."""
+		if not self.rows:
+			return
+
+		self.connection.executemany(
+			"insert into rows (key, sequence, row) values (?, ?, ?) "
+			"on conflict (key) do update set row = excluded.row",
+			(
+				(encode_key(key), self.sequence[key], pickle.dumps(row, pickle.HIGHEST_PROTOCOL))
+				for key, row in self.rows.items()
+			),
+		)
+		self.connection.commit()
+
+		self.rows.clear()
+		self.sequence.clear()
+		self.spills += 1
+
+	def close(self) -> None:
+		self.connection.close()
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+	def __del__(self) -> None:
+		if hasattr(self, "connection"):
+			self.close()
@@ -135,6 +135,13 @@ frappe.query_reports["Stock Balance Report"] = {
 			label: __("Show Stock Ageing Data"),
 			fieldtype: "Check",
 		},
+		{
+			fieldname: "ageing_ranges",
+			label: __("Ageing Ranges (Days)"),
+			fieldtype: "Data",
+			default: "30, 60, 90",
+			depends_on: "eval: doc.show_stock_ageing_data",
+		},
 		{
 			fieldname: "ignore_closing_balance",
 			label: __("Ignore Closing Balance"),
@@ -147,16 +154,146 @@ frappe.query_reports["Stock Balance Report"] = {
 			fieldtype: "Check",
 			default: 0,
 		},
+		{
+			fieldname: "periodicity",
+			label: __("Periodicity"),
+			fieldtype: "Select",
+			options: [
+				{ value: "", label: __("None") },
+				{ value: "Weekly", label: __("Weekly") },
+				{ value: "Monthly", label: __("Monthly") },
+				{ value: "Quarterly", label: __("Quarterly") },
+			],
+			default: "",
+		},
+		{
+			fieldname: "rollup",
+			label: __("Subtotals By"),
+			fieldtype: "Select",
+			options: [
+				{ value: "", label: __("None") },
+				{ value: "Warehouse", label: __("Warehouse") },
+				{ value: "Item Group", label: __("Item Group") },
+				{ value: "Item", label: __("Item") },
+			],
+			default: "",
+			on_change: (report) => {
+				set_rollup_tree(report);
+				// the datatable is reused across refreshes, tree settings only apply to a new one
+				report.datatable = null;
+				report.refresh();
+			},
+		},
+		{
+			fieldname: "rollup_collapsed",
+			label: __("Load Rows on Expand"),
+			fieldtype: "Check",
+			default: 0,
+			depends_on: "eval: doc.rollup",
+		},
 		{
 			fieldname: "show_dimension_wise_stock",
 			label: __("Show Dimension Wise Stock"),
 			fieldtype: "Check",
 			default: 0,
 		},
+		{
+			// set from the URL (?instrument=1) to get the run profile as the report message
+			fieldname: "instrument",
+			label: __("Instrument Run"),
+			fieldtype: "Check",
+			hidden: 1,
+			default: 0,
+		},
 	],
 
+	onload: function (report) {
+		set_rollup_tree(report);
+
+		report.page.add_menu_item(__("Export Large Report"), () => {
+			frappe.prompt(
+				{
+					fieldname: "file_format",
+					label: __("File Format"),
+					fieldtype: "Select",
+					options: "CSV\nExcel\nParquet",
+					default: "CSV",
+					reqd: 1,
+				},
+				(values) => {
+					frappe.call({
+						method: "trikaya.trikaya.report.stock_balance_report.export.export_stock_balance",
+						args: { filters: report.get_filter_values(), file_format: values.file_format },
+						callback: (r) => frappe.show_alert({ message: r.message, indicator: "blue" }),
+					});
+				},
+				__("Export Stock Balance")
+			);
+		});
+
+		frappe.realtime.off("stock_balance_report_export");
+		frappe.realtime.on("stock_balance_report_export", (data) => {
+			if (data.status === "Completed") {
+				window.open(data.file_url);
+			} else {
+				frappe.msgprint(__("Stock Balance export failed, please check the Error Log."));
+			}
+		});
+
+		// long runs are prepared in the background, follow their progress and load the result
+		frappe.realtime.off("stock_balance_report_progress");
+		frappe.realtime.on("stock_balance_report_progress", (progress) => {
+			if (progress.status === "Completed") {
+				frappe.hide_progress();
+				report.refresh();
+			} else if (progress.status === "Failed") {
+				frappe.hide_progress();
+				frappe.msgprint(__("Stock Balance Report failed, please check the Error Log."));
+			} else {
+				frappe.show_progress(
+					__("Stock Balance Report"),
+					progress.step,
+					progress.steps,
+					progress.description
+				);
+			}
+		});
+
+		// collapsed subtotals load their rows when their label is clicked
+		report.page.wrapper.on("click", ".stock-balance-rollup", (event) => {
+			const rollup_name = decodeURIComponent($(event.currentTarget).attr("data-rollup-name"));
+			const index = report.data.findIndex((row) => row.rollup_name === rollup_name);
+			if (index === -1 || report.data[index].rows_loaded) return;
+
+			frappe.call({
+				method: "trikaya.trikaya.report.stock_balance_report.rollups.get_rollup_rows",
+				args: { filters: report.get_filter_values(), rollup_name: rollup_name },
+				freeze: true,
+				callback: (r) => {
+					report.data[index].rows_loaded = 1;
+					report.data.splice(index + 1, 0, ...(r.message || []));
+					report.datatable.refresh(report.data, report.columns);
+				},
+			});
+		});
+	},
+
 	formatter: function (value, row, column, data, default_formatter) {
+		if (data && data.is_rollup && column.fieldname == "item_code") {
+			const label = frappe.utils.escape_html(data.rollup_label);
+			if (data.indent == 1 && !data.rows_loaded && frappe.query_report.get_filter_value("rollup_collapsed")) {
+				return `<a class="stock-balance-rollup bold" data-rollup-name="${encodeURIComponent(
+					data.rollup_name
+				)}">${label}</a>`;
+			}
+
+			return `<b>${label}</b>`;
+		}
+
 		value = default_formatter(value, row, column, data);
+		if (data && data.is_rollup) {
+			value = `<b>${value}</b>`;
+		}
 
 		if (column.fieldname == "out_qty" && data && data.out_qty > 0) {
 			value = "<span style='color:red'>" + value + "</span>";
@@ -168,4 +305,17 @@ frappe.query_reports["Stock Balance Report"] = {
 	},
 };
 
+// subtotal rows of the rollup filter are indented, the total row adds up the company rows
+function set_rollup_tree(report) {
+	const rollup = Boolean(report.get_filter_value("rollup"));
+
+	report.tree_report = rollup;
+	Object.assign(report.report_settings, {
+		tree: rollup,
+		name_field: rollup ? "rollup_name" : undefined,
+		parent_field: rollup ? "rollup_parent" : undefined,
+		initial_depth: rollup ? 1 : undefined,
+	});
+}
+
 erpnext.utils.add_inventory_dimensions("Stock Balance", 8);
@@ -2,22 +2,57 @@
 # License: GNU General Public License v3. See license.txt
 
 
-from operator import itemgetter
+import json
+from bisect import bisect_right
 from typing import Any, TypedDict
 
 import frappe
 from frappe import _
-from frappe.query_builder import Order
-from frappe.query_builder.functions import Coalesce
-from frappe.utils import add_days, cint, date_diff, flt, getdate
-from frappe.utils.nestedset import get_descendants_of
+from frappe.query_builder import Case, Order
+from frappe.query_builder.functions import Coalesce, Count, IfNull, Round, Sum
+from frappe.utils import (
+	add_days,
+	cint,
+	flt,
+	formatdate,
+	get_last_day,
+	get_quarter_ending,
+	getdate,
+)
+from pypika import analytics as an
 
 import erpnext
 from erpnext.stock.doctype.inventory_dimension.inventory_dimension import get_inventory_dimensions
-from erpnext.stock.doctype.warehouse.warehouse import apply_warehouse_filter
-from erpnext.stock.report.stock_ageing.stock_ageing import FIFOSlots, get_average_age
 from erpnext.stock.utils import add_additional_uom_columns
 
+from trikaya.trikaya.report.stock_balance_report.ageing import (
+	StockAgeing,
+	get_ageing_ranges,
+	get_range_labels,
+)
+from trikaya.trikaya.report.stock_balance_report.background import (
+	get_background_result,
+	is_background_run,
+)
+from trikaya.trikaya.report.stock_balance_report.closing_balances import (
+	apply_closing_balance_filters,
+	get_closing_balance_filters,
+	record_filter_usage,
+)
+from trikaya.trikaya.report.stock_balance_report.fifo_slots import StreamingFIFOSlots
+from trikaya.trikaya.report.stock_balance_report.instrumentation import RunProfiler, is_instrumented
+from trikaya.trikaya.report.stock_balance_report.item_master import get_item_details
+from trikaya.trikaya.report.stock_balance_report.reservations import get_reserved_qty
+from trikaya.trikaya.report.stock_balance_report.result_cache import get_cached_result
+from trikaya.trikaya.report.stock_balance_report.rollups import Rollup
+from trikaya.trikaya.report.stock_balance_report.sharding import (
+	aggregate_in_shards,
+	get_shard_count,
+	get_warehouse_shards,
+)
+from trikaya.trikaya.report.stock_balance_report.spill import SpillingRowMap, get_max_rows
+from trikaya.trikaya.report.stock_balance_report.tree_filters import get_tree_criterion
+
 
 class StockBalanceFilter(TypedDict):
 	company: str | None
@@ -29,14 +64,191 @@ class StockBalanceFilter(TypedDict):
 	warehouse_type: str | None
 	include_uom: str | None  # include extra info in converted UOM
 	show_stock_ageing_data: bool
+	ageing_ranges: str | None  # comma separated upper bounds in days, such as "30, 60, 90"
 	show_variant_attributes: bool
+	periodicity: str | None  # Weekly, Monthly or Quarterly columns
+	rollup: str | None  # Warehouse, Item Group or Item subtotals under company subtotals
+	rollup_collapsed: bool  # only the subtotal rows, their rows are loaded on expand
 
 
 SLEntry = dict[str, Any]
 
+PROGRESS_INTERVAL = 100000
+REPORT_ROW_CHUNK_SIZE = 10000
+
+
+class StockBalanceRow:
+	"""Balance accumulator of one group by key.
+
+	The report keeps one row per item, warehouse and dimension combination while it
+	scans the ledger, so rows use slots instead of a dict per key and are converted
+	to `frappe._dict` only when the report data is built."""
+
+	__slots__ = (
+		"item_code",
+		"warehouse",
+		"item_group",
+		"company",
+		"currency",
+		"stock_uom",
+		"item_name",
+		"opening_qty",
+		"opening_val",
+		"opening_fifo_queue",
+		"in_qty",
+		"in_val",
+		"out_qty",
+		"out_val",
+		"bal_qty",
+		"bal_val",
+		"val_rate",
+		"periods",
+		"dimensions",
+	)
+
+	FIELDS = __slots__[:-2]
+	FIELD_SET = frozenset(FIELDS)
+	AMOUNT_FIELDS = (
+		"opening_qty",
+		"opening_val",
+		"in_qty",
+		"in_val",
+		"out_qty",
+		"out_val",
+		"bal_qty",
+		"bal_val",
+		"val_rate",
+	)
+
+	def __init__(
+		self,
+		item_code: str,
+		warehouse: str,
+		item_group: str,
+		company: str,
+		currency: str,
+		stock_uom: str,
+		item_name: str,
+		opening_qty: float = 0.0,
+		opening_val: float = 0.0,
+		opening_fifo_queue: list | None = None,
+		val_rate: float = 0.0,
+	) -> None:
+		self.item_code = item_code
+		self.warehouse = warehouse
+		self.item_group = item_group
+		self.company = company
+		self.currency = currency
+		self.stock_uom = stock_uom
+		self.item_name = item_name
+		self.opening_qty = opening_qty
+		self.opening_val = opening_val
+		self.opening_fifo_queue = opening_fifo_queue or []
+		self.in_qty = 0.0
+		self.in_val = 0.0
+		self.out_qty = 0.0
+		self.out_val = 0.0
+		self.bal_qty = opening_qty
+		self.bal_val = opening_val
+		self.val_rate = val_rate
+		self.periods = None
+		self.dimensions = {}
+
+	def get(self, fieldname: str, default=None):
+		if fieldname in self.FIELD_SET:
+			return getattr(self, fieldname)
+
+		return self.dimensions.get(fieldname, default)
+
+	def __getitem__(self, fieldname: str):
+		if fieldname in self.FIELD_SET:
+			return getattr(self, fieldname)
+
+		return self.dimensions[fieldname]
+
+	def __setitem__(self, fieldname: str, value) -> None:
+		if fieldname in self.FIELD_SET:
+			setattr(self, fieldname, value)
+		else:
+			self.dimensions[fieldname] = value
+
+	def round_amounts(self, precision: int) -> bool:
+		"""Round the quantities and values, returns False if the row has no transactions."""
+		has_transactions = False
+		for fieldname in self.AMOUNT_FIELDS:
+			value = flt(getattr(self, fieldname), precision)
+			setattr(self, fieldname, value)
+
+			if value and fieldname != "val_rate":
+				has_transactions = True
+
+		return has_transactions
+
+	def add_to_period(self, period: int, qty_diff: float, value_diff: float, precision: int) -> None:
+		"""Add a ledger entry to the in/out buckets of `period`, the index of its period in the run."""
+		buckets = self.periods.get(period)
+		if buckets is None:
+			buckets = self.periods[period] = [0.0, 0.0, 0.0, 0.0]
+
+		if flt(qty_diff, precision) >= 0:
+			buckets[0] += qty_diff
+		else:
+			buckets[1] -= qty_diff
+
+		if flt(value_diff, precision) >= 0:
+			buckets[2] += value_diff
+		else:
+			buckets[3] -= value_diff
+
+	def get_period_values(self, fieldnames: list[str], precision: int) -> dict:
+		"""Opening, in, out and closing of every period, `fieldnames` holds the prefix of each period."""
+		values = {}
+		bal_qty, bal_val = self.opening_qty, self.opening_val
+
+		for period, prefix in enumerate(fieldnames):
+			in_qty, out_qty, in_val, out_val = self.periods.get(period) or (0.0, 0.0, 0.0, 0.0)
+			closing_qty = bal_qty + in_qty - out_qty
+			closing_val = bal_val + in_val - out_val
+
+			for fieldname, value in (
+				("opening_qty", bal_qty),
+				("in_qty", in_qty),
+				("out_qty", out_qty),
+				("bal_qty", closing_qty),
+				("opening_val", bal_val),
+				("in_val", in_val),
+				("out_val", out_val),
+				("bal_val", closing_val),
+			):
+				values[f"{prefix}_{fieldname}"] = flt(value, precision)
+
+			bal_qty, bal_val = closing_qty, closing_val
+
+		return values
+
+	def as_dict(self) -> frappe._dict:
+		row = frappe._dict({fieldname: getattr(self, fieldname) for fieldname in self.FIELDS})
+		row.update(self.dimensions)
+
+		return row
+
 
 def execute(filters: StockBalanceFilter | None = None):
-	return StockBalanceReport(filters).run()
+	report = StockBalanceReport(filters)
+
+	if is_background_run(filters):
+		return get_background_result(filters, report)
+
+	def run():
+		# counted on cache misses only, hits do not write to redis
+		record_filter_usage(filters)
+		return report.run()
+
+	if filters.get("instrument"):
+		# the profile belongs to this run, a cached result would carry an old one
+		return run()
+
+	return get_cached_result(filters, run)
 
 
 class StockBalanceReport:
@@ -46,9 +258,23 @@ class StockBalanceReport:
 		self.to_date = getdate(filters.get("to_date"))
 
 		self.start_from = None
+		self.opening_source = None
+		self.shards = []
+		self.shard_warehouses = None
+		self.allow_shards = True
 		self.data = []
 		self.columns = []
 		self.sle_entries: list[SLEntry] = []
+		self.fifo_slots = None
+		self.spilling_map = None
+		self.max_map_rows = None
+		self.items = {}
+		self.progress = None
+		self.scanned_rows = 0
+		self.profiler = RunProfiler(is_instrumented(filters))
+		self.periods = self.get_periods()
+		self.period_starts = [start for start, _end in self.periods]
+		self.period_fieldnames = [f"period_{start:%Y%m%d}" for start in self.period_starts]
 		self.set_company_currency()
 
 	def set_company_currency(self) -> None:
@@ -58,156 +284,653 @@ class StockBalanceReport:
 			self.company_currency = frappe.db.get_single_value("Global Defaults", "default_currency")
 
 	def run(self):
-		self.float_precision = cint(frappe.db.get_default("float_precision")) or 3
+		with self.profiler.phase("run") as run_phase:
+			self.prepare()
+			self.prepare_new_data()
 
-		self.inventory_dimensions = self.get_inventory_dimension_fields()
-		self.prepare_opening_data_from_closing_balance()
-		self.prepare_stock_ledger_entries()
-		self.prepare_new_data()
+			with self.profiler.phase("columns"):
+				if not self.columns:
+					self.columns = self.get_columns()
+
+				self.add_additional_uom_columns()
 
-		if not self.columns:
-			self.columns = self.get_columns()
+			run_phase["rows"] = len(self.data)
 
-		self.add_additional_uom_columns()
+		self.profiler.log(self.filters)
+		if self.filters.get("instrument"):
+			return self.columns, self.data, self.profiler.get_message()
 
 		return self.columns, self.data
 
+	def prepare(self) -> None:
+		"""Load the opening balances and build the ledger query."""
+		self.float_precision = cint(frappe.db.get_default("float_precision")) or 3
+
+		with self.profiler.phase("inventory_dimensions"):
+			self.inventory_dimensions = self.get_inventory_dimension_fields()
+
+		self.shards = self.get_warehouse_shards()
+		self.publish_progress("opening")
+
+		with self.profiler.phase("opening_balances") as phase:
+			self.prepare_opening_data_from_closing_balance()
+			if self.spilling_map is not None:
+				# the length of a spilling map writes every row out first
+				phase["rows"] = self.spilling_map.next_sequence
+			else:
+				phase["rows"] = len(self.opening_data)
+
+		with self.profiler.phase("query_build"):
+			self.prepare_stock_ledger_entries()
+
+		self.publish_progress("ledger")
+
+	def get_periods(self) -> list[tuple]:
+		"""Start and end dates of the periods of a periodic run, empty otherwise."""
+		periodicity = self.filters.get("periodicity")
+		if not periodicity:
+			return []
+
+		periods = []
+		start = self.from_date
+		while start <= self.to_date:
+			if periodicity == "Weekly":
+				end = add_days(start, 6 - start.weekday())
+			elif periodicity == "Quarterly":
+				end = get_quarter_ending(start)
+			else:
+				end = get_last_day(start)
+
+			end = min(getdate(end), self.to_date)
+			periods.append((start, end))
+			start = add_days(end, 1)
+
+		return periods
+
+	def get_period_label(self, start, end) -> str:
+		periodicity = self.filters.get("periodicity")
+		if periodicity == "Monthly":
+			return formatdate(start, "MMM YYYY")
+
+		if periodicity == "Quarterly":
+			return _("Q{0} {1}").format((start.month - 1) // 3 + 1, start.year)
+
+		return f"{formatdate(start)} - {formatdate(end)}"
+
+	def publish_progress(self, phase: str, **details) -> None:
+		"""Report the phase the run is in to the background job running it, if any."""
+		if self.progress:
+			self.progress(phase, **details)
+
 	def prepare_opening_data_from_closing_balance(self) -> None:
 		self.opening_data = frappe._dict({})
+		if max_rows := self.get_max_map_rows():
+			self.spilling_map = SpillingRowMap(max_rows)
+
+		if self.shards:
+			# every shard loads the opening data of its own warehouses
+			return
 
 		closing_balance = self.get_closing_balance()
+		snapshot = self.get_balance_snapshot()
+
+		if snapshot and (
+			not closing_balance or getdate(snapshot.period_end) > getdate(closing_balance[0].to_date)
+		):
+			self.prepare_opening_data_from_snapshot(snapshot)
+			return
+
 		if not closing_balance:
 			return
 
+		if indexed := self.get_indexed_closing_balance(closing_balance[0].name):
+			self.prepare_opening_data_from_snapshot(indexed)
+			return
+
 		self.start_from = add_days(closing_balance[0].to_date, 1)
 		res = frappe.get_doc("Closing Stock Balance", closing_balance[0].name).get_prepared_data()
 
+		shard_warehouses = set(self.shard_warehouses or [])
 		for entry in res.data:
 			entry = frappe._dict(entry)
+			if shard_warehouses and entry.warehouse not in shard_warehouses:
+				continue
+
+			self.add_opening_entry(self.get_group_by_key(entry), entry)
+
+	def prepare_opening_data_from_snapshot(self, snapshot) -> None:
+		self.start_from = add_days(snapshot.period_end, 1)
+
+		entry_table = frappe.qb.DocType("Stock Balance Snapshot Entry")
+
+		query = (
+			frappe.qb.from_(entry_table)
+			.select(
+				entry_table.company,
+				entry_table.item_code,
+				entry_table.warehouse,
+				entry_table.inventory_dimensions,
+				entry_table.bal_qty,
+				entry_table.bal_val,
+				entry_table.val_rate,
+				entry_table.fifo_queue,
+			)
+			.where(entry_table.snapshot == snapshot.name)
+		)
 
-			group_by_key = self.get_group_by_key(entry)
-			if group_by_key not in self.opening_data:
-				self.opening_data.setdefault(group_by_key, entry)
+		query = self.apply_warehouse_filters(query, entry_table)
+		query = self.apply_items_filters(query, entry_table)
+		query = self.apply_shard_filter(query, entry_table)
+
+		with frappe.db.unbuffered_cursor():
+			for entry in query.run(as_dict=True, as_iterator=True):
+				if entry.inventory_dimensions:
+					entry.update(json.loads(entry.inventory_dimensions))
+
+				if entry.fifo_queue:
+					entry.fifo_queue = json.loads(entry.fifo_queue)
+
+				self.add_opening_entry(self.get_group_by_key(entry), entry)
+
+	def add_opening_entry(self, group_by_key, entry) -> None:
+		"""Keep the first opening balance of each key.
+
+		Under a memory budget the opening balances are not held as a dict of their own:
+		each becomes a row of the map that spills, which the ledger entries then add to."""
+		if self.spilling_map is None:
+			self.opening_data.setdefault(group_by_key, entry)
+		elif group_by_key not in self.spilling_map:
+			self.initialize_data(self.spilling_map, group_by_key, entry, opening_data=entry)
 
 	def prepare_new_data(self):
+		report_rows = self.get_report_rows()
+
+		with self.profiler.phase("report_rows") as phase:
+			if self.filters.get("rollup"):
+				# subtotals are added up as the rows are emitted, their fields come from the columns
+				self.columns = self.get_columns()
+				rollup = Rollup(
+					self.filters.get("rollup"),
+					self.columns,
+					self.float_precision,
+					collapsed=self.filters.get("rollup_collapsed"),
+				)
+				self.data.extend(rollup.get_rows(report_rows))
+			else:
+				self.data.extend(report_rows)
+
+			phase["rows"] = len(self.data)
+
+	def get_report_rows(self):
+		"""Aggregate the ledger, then return a generator of the report rows.
+
+		Rows are built one at a time from the item warehouse map, so exports can write
+		them out without holding the whole report data."""
 		self.item_warehouse_map = self.get_item_warehouse_map()
 
 		if self.filters.get("show_stock_ageing_data"):
-			self.filters["show_warehouse_wise_stock"] = True
-			item_wise_fifo_queue = FIFOSlots(self.filters, self.sle_entries).generate()
+			self.publish_progress("ageing", rows=len(self.item_warehouse_map))
 
-		_func = itemgetter(1)
+		self.publish_progress("enrichment", rows=len(self.item_warehouse_map))
 
 		del self.sle_entries
 
-		sre_details = self.get_sre_reserved_qty_details()
+		return self.iter_report_rows()
 
-		variant_values = {}
-		if self.filters.get("show_variant_attributes"):
-			variant_values = self.get_variant_values_for()
+	def iter_report_rows(self):
+		"""Round, filter, enrich and emit the rows of the item warehouse map in a single pass.
 
-		for _key, report_data in self.item_warehouse_map.items():
-			if variant_data := variant_values.get(report_data.item_code):
-				report_data.update(variant_data)
+		Rows are taken in chunks of `REPORT_ROW_CHUNK_SIZE`, so the item master, the
+		reservations and the stock ageing of a chunk are looked up together without a
+		second copy of the map."""
+		for rows in self.iter_row_chunks():
+			yield from self.get_chunk_report_rows(rows)
 
-			if self.filters.get("show_stock_ageing_data"):
-				opening_fifo_queue = self.get_opening_fifo_queue(report_data) or []
+	def iter_row_chunks(self):
+		"""Rows with transactions, rounded, and with stock unless zero stock items are included."""
+		include_zero_stock_items = self.filters.get("include_zero_stock_items")
 
-				fifo_queue = []
-				if fifo_queue := item_wise_fifo_queue.get((report_data.item_code, report_data.warehouse)):
-					fifo_queue = fifo_queue.get("fifo_queue")
+		rows = []
+		for row in self.item_warehouse_map.values():
+			if not row.round_amounts(self.float_precision):
+				continue
 
-				if fifo_queue:
-					opening_fifo_queue.extend(fifo_queue)
+			if not include_zero_stock_items and row.bal_qty == 0 and row.bal_val == 0:
+				continue
 
-				stock_ageing_data = {"average_age": 0, "earliest_age": 0, "latest_age": 0}
-				if opening_fifo_queue:
-					fifo_queue = sorted(filter(_func, opening_fifo_queue), key=_func)
-					if not fifo_queue:
-						continue
+			rows.append(row)
+			if len(rows) == REPORT_ROW_CHUNK_SIZE:
+				yield rows
+				rows = []
 
-					to_date = self.to_date
-					stock_ageing_data["average_age"] = get_average_age(fifo_queue, to_date)
-					stock_ageing_data["earliest_age"] = date_diff(to_date, fifo_queue[0][1])
-					stock_ageing_data["latest_age"] = date_diff(to_date, fifo_queue[-1][1])
-					stock_ageing_data["fifo_queue"] = fifo_queue
+		if rows:
+			yield rows
 
-				report_data.update(stock_ageing_data)
+	def get_chunk_report_rows(self, rows: list) -> list[frappe._dict]:
+		# chunks add up into one phase each, under the phase consuming the rows
+		with self.profiler.phase("item_details", accumulate=True) as phase:
+			items = get_item_details({row.item_code for row in rows})
+			self.items.update(items)
+			phase["rows"] = len(items)
 
-			report_data.update(
-				{"reserved_stock": sre_details.get((report_data.item_code, report_data.warehouse), 0.0)}
-			)
+		with self.profiler.phase("reserved_stock", accumulate=True):
+			reserved_qty = get_reserved_qty((row.item_code, row.warehouse) for row in rows)
 
-			if (
-				not self.filters.get("include_zero_stock_items")
-				and report_data
-				and report_data.bal_qty == 0
-				and report_data.bal_val == 0
-			):
+		stock_ageing = None
+		if self.filters.get("show_stock_ageing_data"):
+			with self.profiler.phase("stock_ageing", accumulate=True):
+				stock_ageing = StockAgeing(
+					self.get_fifo_queues(rows), self.to_date, self.get_ageing_ranges()
+				)
+
+		report_rows = []
+		for index, row in enumerate(rows):
+			if stock_ageing and stock_ageing.is_dropped(index):
 				continue
 
-			self.data.append(report_data)
+			report_data = row.as_dict()
+			if item := items.get(row.item_code):
+				report_data.item_name = item.item_name
+				report_data.item_group = item.item_group
+				report_data.stock_uom = item.stock_uom
+
+			if self.period_starts:
+				report_data.update(row.get_period_values(self.period_fieldnames, self.float_precision))
+
+			if stock_ageing:
+				report_data.update(stock_ageing.get_row(index))
+
+			report_data.reserved_stock = reserved_qty.get((row.item_code, row.warehouse), 0.0)
+			report_rows.append(report_data)
+
+		if self.filters.get("show_variant_attributes"):
+			with self.profiler.phase("variant_attributes", accumulate=True):
+				for report_data in report_rows:
+					if item := items.get(report_data.item_code):
+						report_data.update(item.variant_attributes)
+
+		return report_rows
+
+	def get_fifo_queues(self, rows: list):
+		"""Opening and in range FIFO slots of each of the rows."""
+		item_wise_fifo_queue = self.fifo_slots.item_details
+
+		for row in rows:
+			fifo_queue = row.opening_fifo_queue or []
+			if details := item_wise_fifo_queue.get((row.item_code, row.warehouse)):
+				fifo_queue = fifo_queue + details["fifo_queue"]
+
+			yield fifo_queue
+
+	def get_ageing_ranges(self) -> list[int]:
+		return get_ageing_ranges(self.filters.get("ageing_ranges"))
 
 	def get_item_warehouse_map(self):
+		with self.profiler.phase("ledger_scan") as phase:
+			if self.shards:
+				item_warehouse_map = aggregate_in_shards(self, self.shards)
+			else:
+				item_warehouse_map = self.aggregate_stock_ledger_entries()
+
+			phase["rows"] = self.scanned_rows
+
+		# rows are rounded and empty ones skipped as they are emitted, see iter_report_rows
+		return item_warehouse_map
+
+	def get_unrounded_item_warehouse_map(self):
+		"""Aggregate the ledger without opening data, rounding or dropping empty rows."""
+		self.float_precision = cint(frappe.db.get_default("float_precision")) or 3
+		self.inventory_dimensions = self.get_inventory_dimension_fields()
+		self.opening_data = frappe._dict({})
+		self.prepare_stock_ledger_entries()
+
+		return self.aggregate_stock_ledger_entries()
+
+	def get_warehouse_shards(self) -> list[list[str]]:
+		"""Warehouse shards to aggregate in parallel, empty when the run is not sharded.
+
+		Stock ageing needs every ledger entry in a single ordered pass to follow stock
+		transfers between warehouses, so it is never sharded."""
+		if (
+			not self.allow_shards
+			or self.shard_warehouses is not None
+			or self.filters.get("show_stock_ageing_data")
+		):
+			return []
+
+		if self.get_max_map_rows():
+			# shard maps are merged in memory
+			return []
+
+		if getattr(frappe.local, "request", None):
+			# waiting on shard jobs would hold the web worker past the request timeout,
+			# long runs are queued by `is_background_run` and sharded there
+			return []
+
+		shard_count = get_shard_count()
+		if shard_count < 2:
+			return []
+
+		shards = get_warehouse_shards(self, shard_count)
+		return shards if len(shards) > 1 else []
+
+	def get_shard_item_warehouse_map(self, warehouses: list[str]) -> dict:
+		"""Unrounded item warehouse map of the ledger entries of `warehouses` only."""
+		self.shard_warehouses = warehouses
+		self.float_precision = cint(frappe.db.get_default("float_precision")) or 3
+		self.inventory_dimensions = self.get_inventory_dimension_fields()
+		self.prepare_opening_data_from_closing_balance()
+		self.prepare_stock_ledger_entries()
+
+		return self.aggregate_stock_ledger_entries()
+
+	def aggregate_stock_ledger_entries(self):
 		item_warehouse_map = {}
+		if self.spilling_map is not None:
+			item_warehouse_map = self.spilling_map
+		elif max_rows := self.get_max_map_rows():
+			item_warehouse_map = SpillingRowMap(max_rows)
+
 		self.opening_vouchers = self.get_opening_vouchers()
 
+		if self.use_sql_aggregation():
+			return self.aggregate_stock_ledger_entries_in_sql()
+
 		if self.filters.get("show_stock_ageing_data"):
-			self.sle_entries = self.sle_query.run(as_dict=True)
+			# no query can run while the unbuffered cursor is streaming
+			with self.profiler.phase("fifo_serial_nos"):
+				self.fifo_slots = StreamingFIFOSlots(self.get_serial_nos_by_bundle())
 
 		# HACK: This is required to avoid causing db query in flt
 		_system_settings = frappe.get_cached_doc("System Settings")
 		with frappe.db.unbuffered_cursor():
-			if not self.filters.get("show_stock_ageing_data"):
-				self.sle_entries = self.sle_query.run(as_dict=True, as_iterator=True)
+			self.sle_entries = self.sle_query.run(as_dict=True, as_iterator=True)
+
+			row_count = 0
+
+			for row_count, entry in enumerate(self.sle_entries, start=1):
+				if not row_count % PROGRESS_INTERVAL:
+					self.publish_progress("ledger", rows=row_count)
 
-			for entry in self.sle_entries:
 				group_by_key = self.get_group_by_key(entry)
 				if group_by_key not in item_warehouse_map:
 					self.initialize_data(item_warehouse_map, group_by_key, entry)
 
 				self.prepare_item_warehouse_map(item_warehouse_map, entry, group_by_key)
 
+				if self.fifo_slots:
+					self.fifo_slots.update(entry)
+
 				if self.opening_data.get(group_by_key):
 					del self.opening_data[group_by_key]
 
+			self.scanned_rows = row_count
+
 		for group_by_key, entry in self.opening_data.items():
 			if group_by_key not in item_warehouse_map:
 				self.initialize_data(item_warehouse_map, group_by_key, entry)
 
-		item_warehouse_map = filter_items_with_no_transactions(
-			item_warehouse_map, self.float_precision, self.inventory_dimensions
+		return item_warehouse_map
+
+	def get_serial_nos_by_bundle(self) -> dict[str, list[str]]:
+		"""Serial nos of the serial and batch bundles of the ledger entries in the report."""
+		sle = frappe.qb.DocType("Stock Ledger Entry")
+		bundle_entry = frappe.qb.DocType("Serial and Batch Entry")
+
+		query = (
+			self.get_stock_ledger_query(sle)
+			.inner_join(bundle_entry)
+			.on(bundle_entry.parent == sle.serial_and_batch_bundle)
+			.select(sle.serial_and_batch_bundle, bundle_entry.serial_no)
+			.where((sle.has_serial_no == 1) & (IfNull(bundle_entry.serial_no, "") != ""))
+		)
+
+		serial_nos_by_bundle = {}
+		for bundle, serial_no in query.run():
+			serial_nos_by_bundle.setdefault(bundle, []).append(serial_no)
+
+		return serial_nos_by_bundle
+
+	def get_max_map_rows(self) -> int:
+		"""Rows the item warehouse map keeps in memory before spilling to disk, 0 for no limit.
+
+		Only runs estimated to build more rows than the memory budget holds spill, the
+		others keep SQL aggregation and sharding. Stock ageing reads the map by position
+		alongside its FIFO queues, so it never spills."""
+		if self.filters.get("show_stock_ageing_data"):
+			return 0
+
+		if self.max_map_rows is None:
+			max_rows = get_max_rows()
+			self.max_map_rows = max_rows if max_rows and self.estimate_map_rows() > max_rows else 0
+
+		return self.max_map_rows
+
+	def estimate_map_rows(self) -> int | float:
+		"""Upper estimate of the rows of the item warehouse map.
+
+		Without dimensions a row is an item and warehouse pair, and Bin holds one for
+		every pair with stock transactions. Rows split by inventory dimension are
+		estimated from the latest dimension wise snapshot of the company, and taken as
+		unbounded without one."""
+		if self.get_group_by_dimensions():
+			row_count = frappe.db.get_value(
+				"Stock Balance Snapshot",
+				{
+					"company": self.filters.get("company"),
+					"dimension_wise": 1,
+					"status": "Completed",
+					"closing_stock_balance": ("is", "not set"),
+				},
+				"row_count",
+				order_by="period_end desc",
+			)
+			return cint(row_count) if row_count is not None else float("inf")
+
+		bin = frappe.qb.DocType("Bin")
+		query = frappe.qb.from_(bin).select(Count("*"))
+		if self.filters.get("company"):
+			warehouse = frappe.qb.DocType("Warehouse")
+			query = (
+				query.inner_join(warehouse)
+				.on(warehouse.name == bin.warehouse)
+				.where(warehouse.company == self.filters.get("company"))
+			)
+
+		return cint(query.run()[0][0])
+
+	def use_sql_aggregation(self) -> bool:
+		"""Without stock ageing no ledger row is needed in Python, so the buckets are summed in SQL."""
+		if self.filters.get("show_stock_ageing_data") or self.period_starts or self.get_max_map_rows():
+			return False
+
+		return bool(cint(frappe.conf.get("stock_balance_report_sql_aggregation", 1)))
+
+	def aggregate_stock_ledger_entries_in_sql(self):
+		"""Aggregate the ledger in the database instead of streaming every entry.
+
+		Opening/in/out buckets are summed per group key with CASE expressions. Stock
+		Reconciliation entries reset the balance to `qty_after_transaction`, so only those
+		rows come back to Python, each with the running quantity of its key before it.
+		"""
+		item_warehouse_map = {}
+
+		sle = frappe.qb.DocType("Stock Ledger Entry")
+		ledger = self.get_stock_ledger_query(sle)
+		dimensions = self.get_group_by_dimensions()
+
+		def get_key_terms():
+			return [
+				sle.company,
+				sle.item_code,
+				sle.warehouse,
+				*(Coalesce(sle[fieldname], "") for fieldname in dimensions),
+			]
+
+		key_fields = [
+			sle.company,
+			sle.item_code,
+			sle.warehouse,
+			*(Coalesce(sle[fieldname], "").as_(fieldname) for fieldname in dimensions),
+		]
+
+		is_reconciliation = self.get_reconciliation_condition(sle)
+		is_opening = self.get_opening_entry_condition(sle)
+		actual_qty = sle.actual_qty
+		value_diff = sle.stock_value_difference
+
+		def get_bucket(condition, term):
+			return Sum(Case().when(condition, term).else_(0))
+
+		balances = (
+			ledger.select(
+				*key_fields,
+				get_bucket(is_opening & ~is_reconciliation, actual_qty).as_("opening_qty"),
+				get_bucket(
+					~is_opening & ~is_reconciliation & (Round(actual_qty, self.float_precision) >= 0),
+					actual_qty,
+				).as_("in_qty"),
+				get_bucket(
+					~is_opening & ~is_reconciliation & (Round(actual_qty, self.float_precision) < 0),
+					-actual_qty,
+				).as_("out_qty"),
+				get_bucket(is_opening, value_diff).as_("opening_val"),
+				get_bucket(~is_opening & (Round(value_diff, self.float_precision) >= 0), value_diff).as_(
+					"in_val"
+				),
+				get_bucket(~is_opening & (Round(value_diff, self.float_precision) < 0), -value_diff).as_(
+					"out_val"
+				),
+				get_bucket(is_reconciliation, 1).as_("reconciliation_entries"),
+			)
+			.groupby(*get_key_terms())
+		).run(as_dict=True)
+
+		# grouped rows, the ledger entries are not returned one by one
+		self.scanned_rows = len(balances)
+
+		opening_balances = {}
+		reconciled_items = set()
+		for row in balances:
+			group_by_key = self.get_group_by_key(row)
+			if group_by_key not in item_warehouse_map:
+				self.initialize_data(item_warehouse_map, group_by_key, row)
+				opening_balances[group_by_key] = item_warehouse_map[group_by_key].bal_qty
+				self.opening_data.pop(group_by_key, None)
+
+			qty_dict = item_warehouse_map[group_by_key]
+			qty_dict.opening_qty += flt(row.opening_qty)
+			qty_dict.in_qty += flt(row.in_qty)
+			qty_dict.out_qty += flt(row.out_qty)
+			qty_dict.opening_val += flt(row.opening_val)
+			qty_dict.in_val += flt(row.in_val)
+			qty_dict.out_val += flt(row.out_val)
+			qty_dict.bal_qty += flt(row.opening_qty) + flt(row.in_qty) - flt(row.out_qty)
+			qty_dict.bal_val += flt(row.opening_val) + flt(row.in_val) - flt(row.out_val)
+
+			if row.reconciliation_entries:
+				reconciled_items.add(row.item_code)
+
+		if reconciled_items:
+			running_qty = (
+				an.Sum(Case().when(is_reconciliation, 0).else_(actual_qty))
+				.over(*get_key_terms())
+				.orderby(sle.posting_datetime, sle.creation)
+				.rows(an.Preceding(), an.CURRENT_ROW)
+			)
+
+			entries = ledger.select(
+				*key_fields,
+				sle.posting_date,
+				sle.posting_datetime,
+				sle.creation,
+				sle.voucher_type,
+				sle.voucher_no,
+				sle.qty_after_transaction,
+				Case().when(is_reconciliation, 1).else_(0).as_("is_reconciliation"),
+				running_qty.as_("running_qty"),
+			).where(sle.item_code.isin(list(reconciled_items)))
+
+			reconciliation_entries = (
+				frappe.qb.from_(entries)
+				.select(entries.star)
+				.where(entries.is_reconciliation == 1)
+				.orderby(entries.posting_datetime)
+				.orderby(entries.creation)
+			).run(as_dict=True)
+
+			reconciled_qty = {}
+			for entry in reconciliation_entries:
+				group_by_key = self.get_group_by_key(entry)
+				qty_before = (
+					opening_balances[group_by_key]
+					+ flt(entry.running_qty)
+					+ reconciled_qty.get(group_by_key, 0.0)
+				)
+				qty_diff = flt(entry.qty_after_transaction) - qty_before
+				reconciled_qty[group_by_key] = reconciled_qty.get(group_by_key, 0.0) + qty_diff
+
+				qty_dict = item_warehouse_map[group_by_key]
+				if self.is_opening_entry(entry):
+					qty_dict.opening_qty += qty_diff
+				elif flt(qty_diff, self.float_precision) >= 0:
+					qty_dict.in_qty += qty_diff
+				else:
+					qty_dict.out_qty += abs(qty_diff)
+
+				qty_dict.bal_qty += qty_diff
+
+		latest_entry = (
+			an.RowNumber()
+			.over(*get_key_terms())
+			.orderby(sle.posting_datetime, sle.creation, order=Order.desc)
 		)
+		ranked_entries = ledger.select(*key_fields, sle.valuation_rate, latest_entry.as_("latest_entry"))
+		valuation_rates = (
+			frappe.qb.from_(ranked_entries)
+			.select(ranked_entries.star)
+			.where(ranked_entries.latest_entry == 1)
+		).run(as_dict=True)
+
+		for entry in valuation_rates:
+			item_warehouse_map[self.get_group_by_key(entry)].val_rate = flt(entry.valuation_rate)
+
+		for group_by_key, entry in self.opening_data.items():
+			if group_by_key not in item_warehouse_map:
+				self.initialize_data(item_warehouse_map, group_by_key, entry)
 
 		return item_warehouse_map
 
-	def get_sre_reserved_qty_details(self) -> dict:
-		from erpnext.stock.doctype.stock_reservation_entry.stock_reservation_entry import (
-			get_sre_reserved_qty_for_items_and_warehouses as get_reserved_qty_details,
+	@staticmethod
+	def get_reconciliation_condition(sle):
+		"""Stock Reconciliation entries that reset the balance to `qty_after_transaction`."""
+		return (sle.voucher_type == "Stock Reconciliation") & (
+			(IfNull(sle.batch_no, "") == "") | (IfNull(sle.serial_no, "") != "")
 		)
 
-		item_code_list, warehouse_list = [], []
-		for d in self.item_warehouse_map:
-			item_code_list.append(d[1])
-			warehouse_list.append(d[2])
+	def get_opening_entry_condition(self, sle):
+		condition = sle.posting_date < self.from_date
+		for voucher_type, vouchers in self.opening_vouchers.items():
+			if vouchers:
+				condition |= (sle.voucher_type == voucher_type) & sle.voucher_no.isin(vouchers)
+
+		return condition
 
-		return get_reserved_qty_details(item_code_list, warehouse_list)
+	def is_opening_entry(self, entry) -> bool:
+		return entry.posting_date < self.from_date or entry.voucher_no in self.opening_vouchers.get(
+			entry.voucher_type, []
+		)
 
 	def prepare_item_warehouse_map(self, item_warehouse_map, entry, group_by_key):
 		qty_dict = item_warehouse_map[group_by_key]
-		for field in self.inventory_dimensions:
-			qty_dict[field] = entry.get(field)
-
-		if entry.voucher_type == "Stock Reconciliation" and (not entry.batch_no or entry.serial_no):
+		if entry.is_reconciliation:
 			qty_diff = flt(entry.qty_after_transaction) - flt(qty_dict.bal_qty)
 		else:
 			qty_diff = flt(entry.actual_qty)
 
 		value_diff = flt(entry.stock_value_difference)
 
-		if entry.posting_date < self.from_date or entry.voucher_no in self.opening_vouchers.get(
-			entry.voucher_type, []
-		):
+		if self.is_opening_entry(entry):
 			qty_dict.opening_qty += qty_diff
 			qty_dict.opening_val += value_diff
 
@@ -222,35 +945,48 @@ class StockBalanceReport:
 			else:
 				qty_dict.out_val += abs(value_diff)
 
+			if self.period_starts:
+				period = bisect_right(self.period_starts, entry.posting_date) - 1
+				qty_dict.add_to_period(period, qty_diff, value_diff, self.float_precision)
+
 		qty_dict.val_rate = entry.valuation_rate
 		qty_dict.bal_qty += qty_diff
 		qty_dict.bal_val += value_diff
 
-	def initialize_data(self, item_warehouse_map, group_by_key, entry):
-		opening_data = self.opening_data.get(group_by_key, {})
-
-		item_warehouse_map[group_by_key] = frappe._dict(
-			{
-				"item_code": entry.item_code,
-				"warehouse": entry.warehouse,
-				"item_group": entry.item_group,
-				"company": entry.company,
-				"currency": self.company_currency,
-				"stock_uom": entry.stock_uom,
-				"item_name": entry.item_name,
-				"opening_qty": opening_data.get("bal_qty") or 0.0,
-				"opening_val": opening_data.get("bal_val") or 0.0,
-				"opening_fifo_queue": opening_data.get("fifo_queue") or [],
-				"in_qty": 0.0,
-				"in_val": 0.0,
-				"out_qty": 0.0,
-				"out_val": 0.0,
-				"bal_qty": opening_data.get("bal_qty") or 0.0,
-				"bal_val": opening_data.get("bal_val") or 0.0,
-				"val_rate": 0.0,
-			}
+	def initialize_data(self, item_warehouse_map, group_by_key, entry, opening_data=None):
+		if opening_data is None:
+			opening_data = self.opening_data.get(group_by_key, {})
+
+		row = StockBalanceRow(
+			item_code=entry.item_code,
+			warehouse=entry.warehouse,
+			# item master fields are added to the report rows from the item master cache
+			item_group=None,
+			company=entry.company,
+			currency=self.company_currency,
+			stock_uom=None,
+			item_name=None,
+			opening_qty=opening_data.get("bal_qty") or 0.0,
+			opening_val=opening_data.get("bal_val") or 0.0,
+			opening_fifo_queue=opening_data.get("fifo_queue"),
+			val_rate=opening_data.get("val_rate") or 0.0,
 		)
 
+		for field in self.get_group_by_dimensions():
+			row.dimensions[field] = entry.get(field)
+
+		if self.period_starts:
+			row.periods = {}
+
+		item_warehouse_map[group_by_key] = row
+
+	def get_group_by_dimensions(self) -> list[str]:
+		"""Inventory dimensions that split the group by key."""
+		if self.filters.get("show_dimension_wise_stock"):
+			return list(self.inventory_dimensions)
+
+		return [fieldname for fieldname in self.inventory_dimensions if self.filters.get(fieldname)]
+
 	def get_group_by_key(self, row) -> tuple:
 		group_by_key = [row.company, row.item_code, row.warehouse]
 
@@ -264,7 +1000,14 @@ class StockBalanceReport:
 		return tuple(group_by_key)
 
 	def get_closing_balance(self) -> list[dict[str, Any]]:
-		if self.filters.get("ignore_closing_balance"):
+		if self.filters.get("ignore_closing_balance") or self.opening_source not in (
+			None,
+			"Closing Stock Balance",
+		):
+			return []
+
+		closing_balance_filters = get_closing_balance_filters(self.filters)
+		if not closing_balance_filters:
 			return []
 
 		table = frappe.qb.DocType("Closing Stock Balance")
@@ -272,84 +1015,150 @@ class StockBalanceReport:
 		query = (
 			frappe.qb.from_(table)
 			.select(table.name, table.to_date)
+			.where((table.docstatus == 1) & (table.to_date <= self.from_date) & (table.status == "Completed"))
+			.orderby(table.to_date, order=Order.desc)
+			.limit(1)
+		)
+
+		# a Closing Stock Balance filtered on fields the report is not filtered on misses stock
+		query = apply_closing_balance_filters(query, table, closing_balance_filters)
+
+		return query.run(as_dict=True)
+
+	def get_balance_snapshot(self) -> dict[str, Any] | None:
+		"""Latest completed Stock Balance Snapshot the report can open from.
+
+		Snapshots built from the ledger carry no FIFO queues and are kept either for plain
+		item/warehouse keys or split by every inventory dimension, so they are skipped for
+		ageing and for runs filtered on individual dimensions. Copies of Closing Stock
+		Balances only serve the filters of their Closing Stock Balance."""
+		if (
+			self.filters.get("ignore_closing_balance")
+			or self.opening_source not in (None, "Stock Balance Snapshot")
+			or self.filters.get("show_stock_ageing_data")
+			or not self.filters.get("company")
+			or any(self.filters.get(field) for field in self.inventory_dimensions)
+		):
+			return None
+
+		dimension_wise = bool(self.filters.get("show_dimension_wise_stock") and self.inventory_dimensions)
+
+		table = frappe.qb.DocType("Stock Balance Snapshot")
+		snapshot = (
+			frappe.qb.from_(table)
+			.select(table.name, table.period_end)
 			.where(
-				(table.docstatus == 1)
-				& (table.company == self.filters.company)
-				& (table.to_date <= self.from_date)
+				(table.company == self.filters.get("company"))
+				& (table.period_end < self.from_date)
+				& (table.dimension_wise == cint(dimension_wise))
 				& (table.status == "Completed")
+				& (IfNull(table.closing_stock_balance, "") == "")
 			)
-			.orderby(table.to_date, order=Order.desc)
+			.orderby(table.period_end, order=Order.desc)
 			.limit(1)
+		).run(as_dict=True)
+
+		return snapshot[0] if snapshot else None
+
+	def get_indexed_closing_balance(self, closing_stock_balance: str) -> dict[str, Any] | None:
+		"""Completed snapshot holding the prepared data of the Closing Stock Balance as indexed rows.
+
+		Until the snapshot is built the report parses the prepared data file itself. It is
+		also parsed when the copy keeps its rows split by inventory dimension and the run
+		does not, or the other way round, since the opening balances are not added up."""
+		snapshot = frappe.db.get_value(
+			"Stock Balance Snapshot",
+			{"closing_stock_balance": closing_stock_balance, "status": "Completed"},
+			["name", "period_end", "dimension_wise"],
+			as_dict=True,
 		)
 
-		for fieldname in ["warehouse", "item_code", "item_group", "warehouse_type"]:
-			if value := self.filters.get(fieldname):
-				if isinstance(value, list | tuple):
-					query = query.where(table[fieldname].isin(value))
-				else:
-					query = query.where(table[fieldname] == value)
+		dimension_wise = bool(self.filters.get("show_dimension_wise_stock") and self.inventory_dimensions)
+		if snapshot and cint(snapshot.dimension_wise) != cint(dimension_wise):
+			return None
+
+		if not snapshot:
+			frappe.enqueue(
+				"trikaya.trikaya.doctype.stock_balance_snapshot.stock_balance_snapshot.index_closing_balance",
+				queue="long",
+				job_id=f"index_closing_stock_balance::{closing_stock_balance}",
+				deduplicate=True,
+				closing_stock_balance=closing_stock_balance,
+			)
 
-		return query.run(as_dict=True)
+		return snapshot
 
 	def prepare_stock_ledger_entries(self):
 		sle = frappe.qb.DocType("Stock Ledger Entry")
-		item_table = frappe.qb.DocType("Item")
 
 		query = (
-			frappe.qb.from_(sle)
-			.inner_join(item_table)
-			.on(sle.item_code == item_table.name)
-			.select(
-				sle.item_code,
-				sle.warehouse,
-				sle.posting_date,
-				sle.actual_qty,
-				sle.valuation_rate,
-				sle.company,
-				sle.voucher_type,
-				sle.qty_after_transaction,
-				sle.stock_value_difference,
-				sle.item_code.as_("name"),
-				sle.voucher_no,
-				sle.stock_value,
-				sle.batch_no,
-				sle.serial_no,
-				sle.serial_and_batch_bundle,
-				sle.has_serial_no,
-				item_table.item_group,
-				item_table.stock_uom,
-				item_table.item_name,
-			)
-			.where((sle.docstatus < 2) & (sle.is_cancelled == 0))
+			self.get_stock_ledger_query(sle)
+			.select(*self.get_ledger_fields(sle))
 			.orderby(sle.posting_datetime)
 			.orderby(sle.creation)
 		)
 
+		self.sle_query = query
+
+	def get_ledger_fields(self, sle) -> list:
+		"""Columns of the ordered ledger query, only those read by the enabled features."""
+		fields = [
+			sle.company,
+			sle.item_code,
+			sle.warehouse,
+			sle.posting_date,
+			sle.voucher_type,
+			sle.voucher_no,
+			sle.actual_qty,
+			sle.qty_after_transaction,
+			sle.valuation_rate,
+			sle.stock_value_difference,
+			Case().when(self.get_reconciliation_condition(sle), 1).else_(0).as_("is_reconciliation"),
+			*(sle[fieldname] for fieldname in self.get_group_by_dimensions()),
+		]
+
+		if self.filters.get("show_stock_ageing_data"):
+			fields += [sle.posting_datetime, sle.serial_no, sle.serial_and_batch_bundle, sle.has_serial_no]
+
+		return fields
+
+	def get_stock_ledger_query(self, sle):
+		"""Stock Ledger Entries matching the report filters, without projection or ordering."""
+		query = frappe.qb.from_(sle).where((sle.docstatus < 2) & (sle.is_cancelled == 0))
+
 		query = self.apply_inventory_dimensions_filters(query, sle)
 		query = self.apply_warehouse_filters(query, sle)
-		query = self.apply_items_filters(query, item_table)
+		query = self.apply_items_filters(query, sle)
 		query = self.apply_date_filters(query, sle)
+		query = self.apply_shard_filter(query, sle)
 
 		if self.filters.get("company"):
 			query = query.where(sle.company == self.filters.get("company"))
 
-		self.sle_query = query
+		return query
+
+	def apply_shard_filter(self, query, table):
+		if self.shard_warehouses is not None:
+			query = query.where(table.warehouse.isin(self.shard_warehouses))
+
+		return query
 
 	def apply_inventory_dimensions_filters(self, query, sle) -> str:
-		inventory_dimension_fields = self.get_inventory_dimension_fields()
-		if inventory_dimension_fields:
-			for fieldname in inventory_dimension_fields:
-				query = query.select(fieldname)
-				if self.filters.get(fieldname):
-					query = query.where(sle[fieldname].isin(self.filters.get(fieldname)))
+		for fieldname in self.inventory_dimensions:
+			if self.filters.get(fieldname):
+				query = query.where(sle[fieldname].isin(self.filters.get(fieldname)))
 
 		return query
 
 	def apply_warehouse_filters(self, query, sle) -> str:
 		warehouse_table = frappe.qb.DocType("Warehouse")
 
-		if self.filters.get("warehouse"):
-			query = apply_warehouse_filter(query, sle, self.filters)
+		if warehouses := self.filters.get("warehouse"):
+			query = (
+				query.join(warehouse_table)
+				.on(warehouse_table.name == sle.warehouse)
+				.where(get_tree_criterion(warehouse_table, "Warehouse", warehouses))
+			)
 
 		elif warehouse_type := self.filters.get("warehouse_type"):
 			query = (
@@ -360,34 +1169,39 @@ class StockBalanceReport:
 
 		return query
 
-	def apply_items_filters(self, query, item_table) -> str:
-	    if item_groups := self.filters.get("item_group"):
-		    if isinstance(item_groups, str):
-			    item_groups = [item_groups]
+	def apply_items_filters(self, query, table) -> str:
+		"""Item filters on `table`, joined with Item only when a filter needs the item master."""
+		if item_codes := self.filters.get("item_code"):
+			query = query.where(table.item_code.isin(item_codes))
 
-		    all_groups = []
-		    for ig in item_groups:
-			    children = get_descendants_of("Item Group", ig, ignore_permissions=True)
-			    all_groups.extend(children)
-			    all_groups.append(ig)
+		if not self.filters.get("item_group") and not self.filters.get("brand"):
+			return query
 
-		    query = query.where(item_table.item_group.isin(all_groups))
-
-	    if item_codes := self.filters.get("item_code"):
-		    query = query.where(item_table.name.isin(item_codes))
+		item_table = frappe.qb.DocType("Item")
+		query = query.inner_join(item_table).on(table.item_code == item_table.name)
 
-	    if brand := self.filters.get("brand"):
-		    query = query.where(item_table.brand == brand)
+		if item_groups := self.filters.get("item_group"):
+			item_group_table = frappe.qb.DocType("Item Group")
+			query = (
+				query.join(item_group_table)
+				.on(item_group_table.name == item_table.item_group)
+				.where(get_tree_criterion(item_group_table, "Item Group", item_groups))
+			)
 
-	    return query
+		if brand := self.filters.get("brand"):
+			query = query.where(item_table.brand == brand)
 
+		return query
 
 	def apply_date_filters(self, query, sle) -> str:
+		# the same bounds on posting_datetime let the ledger be read as a range of the sort index
 		if not self.filters.ignore_closing_balance and self.start_from:
 			query = query.where(sle.posting_date >= self.start_from)
+			query = query.where(sle.posting_datetime >= self.start_from)
 
 		if self.to_date:
 			query = query.where(sle.posting_date <= self.to_date)
+			query = query.where(sle.posting_datetime < add_days(self.to_date, 1))
 
 		return query
 
@@ -509,12 +1323,16 @@ class StockBalanceReport:
 			]
 		)
 
+		if self.periods:
+			columns += self.get_period_columns()
+
 		if self.filters.get("show_stock_ageing_data"):
 			columns += [
 				{"label": _("Average Age"), "fieldname": "average_age", "width": 100},
 				{"label": _("Earliest Age"), "fieldname": "earliest_age", "width": 100},
 				{"label": _("Latest Age"), "fieldname": "latest_age", "width": 100},
 			]
+			columns += self.get_ageing_range_columns()
 
 		if self.filters.get("show_variant_attributes"):
 			columns += [
@@ -524,6 +1342,66 @@ class StockBalanceReport:
 
 		return columns
 
+	def get_period_columns(self) -> list[dict]:
+		columns = []
+		for (start, end), prefix in zip(self.periods, self.period_fieldnames, strict=True):
+			label = self.get_period_label(start, end)
+			for fieldname, title in (
+				("opening_qty", _("Opening Qty")),
+				("in_qty", _("In Qty")),
+				("out_qty", _("Out Qty")),
+				("bal_qty", _("Balance Qty")),
+			):
+				columns.append(
+					{
+						"label": f"{label} {title}",
+						"fieldname": f"{prefix}_{fieldname}",
+						"fieldtype": "Float",
+						"width": 110,
+						"convertible": "qty",
+					}
+				)
+
+			for fieldname, title in (
+				("opening_val", _("Opening Value")),
+				("in_val", _("In Value")),
+				("out_val", _("Out Value")),
+				("bal_val", _("Balance Value")),
+			):
+				columns.append(
+					{
+						"label": f"{label} {title}",
+						"fieldname": f"{prefix}_{fieldname}",
+						"fieldtype": "Currency",
+						"width": 110,
+						"options": "Company:company:default_currency",
+					}
+				)
+
+		return columns
+
+	def get_ageing_range_columns(self) -> list[dict]:
+		columns = []
+		for index, label in enumerate(get_range_labels(self.get_ageing_ranges())):
+			columns += [
+				{
+					"label": _("Age {0} Qty").format(label),
+					"fieldname": f"age_range_{index}_qty",
+					"fieldtype": "Float",
+					"width": 110,
+					"convertible": "qty",
+				},
+				{
+					"label": _("Age {0} Value").format(label),
+					"fieldname": f"age_range_{index}_val",
+					"fieldtype": "Currency",
+					"width": 110,
+					"options": "Company:company:default_currency",
+				},
+			]
+
+		return columns
+
 	def add_additional_uom_columns(self):
 		if not self.filters.get("include_uom"):
 			return
@@ -532,51 +1410,12 @@ class StockBalanceReport:
 		add_additional_uom_columns(self.columns, self.data, self.filters.include_uom, conversion_factors)
 
 	def get_itemwise_conversion_factor(self):
-		items = []
-		if self.filters.item_code or self.filters.item_group:
-			items = [d.item_code for d in self.data]
-
-		table = frappe.qb.DocType("UOM Conversion Detail")
-		query = (
-			frappe.qb.from_(table)
-			.select(
-				table.conversion_factor,
-				table.parent,
-			)
-			.where((table.parenttype == "Item") & (table.uom == self.filters.include_uom))
-		)
-
-		if items:
-			query = query.where(table.parent.isin(items))
-
-		result = query.run(as_dict=1)
-		if not result:
-			return {}
-
-		return {d.parent: d.conversion_factor for d in result}
-
-	def get_variant_values_for(self):
-		"""Returns variant values for items."""
-		attribute_map = {}
-		items = []
-		if self.filters.item_code or self.filters.item_group:
-			items = [d.item_code for d in self.data]
-
-		filters = {}
-		if items:
-			filters = {"parent": ("in", items)}
-
-		attribute_info = frappe.get_all(
-			"Item Variant Attribute",
-			fields=["parent", "attribute", "attribute_value"],
-			filters=filters,
-		)
-
-		for attr in attribute_info:
-			attribute_map.setdefault(attr["parent"], {})
-			attribute_map[attr["parent"]].update({attr["attribute"]: attr["attribute_value"]})
-
-		return attribute_map
+		include_uom = self.filters.include_uom
+		return {
+			item_code: item.conversion_factors[include_uom]
+			for item_code, item in self.items.items()
+			if include_uom in item.conversion_factors
+		}
 
 	def get_opening_vouchers(self):
 		opening_vouchers = {"Stock Entry": [], "Stock Reconciliation": []}
@@ -613,52 +1452,6 @@ class StockBalanceReport:
 	def get_inventory_dimension_fields():
 		return [dimension.fieldname for dimension in get_inventory_dimensions()]
 
-	@staticmethod
-	def get_opening_fifo_queue(report_data):
-		opening_fifo_queue = report_data.get("opening_fifo_queue") or []
-		for row in opening_fifo_queue:
-			row[1] = getdate(row[1])
-
-		return opening_fifo_queue
-
-
-def filter_items_with_no_transactions(
-	iwb_map, float_precision: float, inventory_dimensions: list | None = None
-):
-	pop_keys = []
-	for group_by_key in iwb_map:
-		qty_dict = iwb_map[group_by_key]
-
-		no_transactions = True
-		for key, val in qty_dict.items():
-			if inventory_dimensions and key in inventory_dimensions:
-				continue
-
-			if key in [
-				"item_code",
-				"warehouse",
-				"item_name",
-				"item_group",
-				"project",
-				"stock_uom",
-				"company",
-				"opening_fifo_queue",
-			]:
-				continue
-
-			val = flt(val, float_precision)
-			qty_dict[key] = val
-			if key != "val_rate" and val:
-				no_transactions = False
-
-		if no_transactions:
-			pop_keys.append(group_by_key)
-
-	for key in pop_keys:
-		iwb_map.pop(key)
-
-	return iwb_map
-
 
 def get_variants_attributes() -> list[str]:
 	"""Return all item variant attributes."""
@@ -0,0 +1,81 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import date_diff, getdate
+
+from erpnext.stock.report.stock_ageing.stock_ageing import get_average_age
+
+from trikaya.trikaya.report.stock_balance_report.ageing import (
+	StockAgeing,
+	get_ageing_ranges,
+	get_range_labels,
+)
+
+TO_DATE = "2026-03-31"
+RANGES = [30, 60, 90]
+
+FIFO_QUEUES = [
+	[[5.0, getdate("2026-02-01"), 610.0]],
+	[["SN-1", getdate("2026-01-03"), 100.0], ["SN-3", getdate("2026-01-03"), 100.0]],
+	[[2.0, getdate("2026-01-25"), 100.0], [3.0, getdate("2026-02-15"), 165.0]],
+	[[4.0, getdate("2026-03-10"), 440.0]],
+	[],
+	# negative stock keeps a negative slot
+	[[-4.0, getdate("2025-12-01"), -200.0]],
+]
+
+
+class TestStockAgeing(FrappeTestCase):
+	def test_ages_match_stock_ageing(self):
+		ageing = StockAgeing(FIFO_QUEUES, TO_DATE, RANGES)
+
+		for index, fifo_queue in enumerate(FIFO_QUEUES):
+			row = ageing.get_row(index)
+			if not fifo_queue:
+				self.assertEqual((row["average_age"], row["earliest_age"], row["latest_age"]), (0, 0, 0))
+				continue
+
+			# as the stock ageing report computes them, over the queue sorted by date
+			fifo_queue = sorted(fifo_queue, key=lambda slot: slot[1])
+			self.assertEqual(row["average_age"], get_average_age(fifo_queue, TO_DATE))
+			self.assertEqual(row["earliest_age"], date_diff(TO_DATE, fifo_queue[0][1]))
+			self.assertEqual(row["latest_age"], date_diff(TO_DATE, fifo_queue[-1][1]))
+
+	def test_range_quantities_and_values(self):
+		ageing = StockAgeing(FIFO_QUEUES, TO_DATE, RANGES)
+
+		# serial nos count one unit each, ages on a bound fall in the lower range
+		self.assertEqual(
+			ageing.range_qty,
+			[[0, 5, 0, 0], [0, 0, 2, 0], [0, 3, 2, 0], [4, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, -4]],
+		)
+		self.assertEqual(
+			ageing.range_value,
+			[[0, 610, 0, 0], [0, 0, 200, 0], [0, 165, 100, 0], [440, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, -200]],
+		)
+		self.assertEqual(ageing.get_row(2)["age_range_1_qty"], 3)
+		self.assertEqual(ageing.get_row(2)["age_range_2_val"], 100)
+
+		boundary = StockAgeing([[[1.0, getdate("2026-03-01"), 10.0]]], TO_DATE, RANGES)
+		self.assertEqual(boundary.range_qty, [[1, 0, 0, 0]])
+
+	def test_rows_do_not_depend_on_the_chunk(self):
+		"""The report computes the ageing of its rows chunk by chunk."""
+		ageing = StockAgeing(FIFO_QUEUES, TO_DATE, RANGES)
+		chunked = []
+		for chunk in (FIFO_QUEUES[:3], FIFO_QUEUES[3:]):
+			chunk_ageing = StockAgeing(chunk, TO_DATE, RANGES)
+			chunked += [chunk_ageing.get_row(index) for index in range(len(chunk))]
+
+		self.assertEqual(chunked, [ageing.get_row(index) for index in range(len(FIFO_QUEUES))])
+
+	def test_rows_without_dated_slots_are_dropped(self):
+		ageing = StockAgeing([[[1.0, None, 0.0]], [], FIFO_QUEUES[0]], TO_DATE, RANGES)
+
+		self.assertEqual([ageing.is_dropped(index) for index in range(3)], [True, False, False])
+
+	def test_ageing_ranges(self):
+		self.assertEqual(get_ageing_ranges("60, 30, abc, 0, 30"), [30, 60])
+		self.assertEqual(get_ageing_ranges(None), RANGES)
+		self.assertEqual(get_range_labels([30, 60]), ["0-30", "31-60", "60+"])
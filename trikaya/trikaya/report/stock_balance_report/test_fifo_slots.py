@@ -0,0 +1,153 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+import copy
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime, getdate
+
+from erpnext.stock.report.stock_ageing.stock_ageing import FIFOSlots
+
+from trikaya.trikaya.report.stock_balance_report.fifo_slots import StreamingFIFOSlots
+
+WAREHOUSE = "_Test Warehouse - _TC"
+WAREHOUSE_1 = "_Test Warehouse 1 - _TC"
+
+
+def get_ledger_entries(entries: list[tuple]) -> list[frappe._dict]:
+	"""Ledger rows as the report and the stock ageing report read them, from
+	`(item_code, warehouse, posting datetime, voucher_no, actual_qty, value, fields)` tuples."""
+	balances = {}
+	rows = []
+
+	for item_code, warehouse, posting_datetime, voucher_no, actual_qty, value, fields in entries:
+		key = (item_code, warehouse)
+		if fields.get("voucher_type") == "Stock Reconciliation":
+			balances[key] = fields["qty_after_transaction"]
+		else:
+			balances[key] = balances.get(key, 0.0) + actual_qty
+
+		posting_datetime = get_datetime(posting_datetime)
+		rows.append(
+			frappe._dict(
+				{
+					# the stock ageing report selects the item code as `name`
+					"name": item_code,
+					"item_code": item_code,
+					"warehouse": warehouse,
+					"posting_date": getdate(posting_datetime),
+					"posting_datetime": posting_datetime,
+					"voucher_type": "Stock Entry",
+					"voucher_no": voucher_no,
+					"actual_qty": actual_qty,
+					"qty_after_transaction": balances[key],
+					"stock_value_difference": value,
+					"serial_no": None,
+					"serial_and_batch_bundle": None,
+					"has_serial_no": 0,
+					"has_batch_no": 0,
+					**fields,
+				}
+			)
+		)
+
+	# the ledger is read in posting order across items and warehouses
+	return sorted(rows, key=lambda row: row.posting_datetime)
+
+
+LEDGER_ENTRIES = [
+	("_Test Item", WAREHOUSE, "2026-01-01 10:00", "SE-1", 10, 1000, {}),
+	("_Test Item", WAREHOUSE, "2026-01-10 10:00", "SE-2", 5, 600, {}),
+	# consumes the first slot and part of the second
+	("_Test Item", WAREHOUSE, "2026-01-15 10:00", "SE-3", -12, -1240, {}),
+	# a repack of the same item puts back the stock it takes out, with its age
+	("_Test Item", WAREHOUSE, "2026-01-20 10:00", "SE-4", -2, -240, {}),
+	("_Test Item", WAREHOUSE, "2026-01-20 10:00", "SE-4", 3, 330, {}),
+	("_Test Item", WAREHOUSE, "2026-02-01 10:00", "SE-5", 6, 720, {}),
+	(
+		"_Test Item",
+		WAREHOUSE,
+		"2026-02-05 10:00",
+		"SR-1",
+		0,
+		-120,
+		{"voucher_type": "Stock Reconciliation", "qty_after_transaction": 9},
+	),
+	# a transfer between warehouses takes the oldest slots out of the source
+	("_Test Item", WAREHOUSE, "2026-02-10 10:00", "SE-6", -4, -440, {}),
+	("_Test Item", WAREHOUSE_1, "2026-02-10 10:00", "SE-6", 4, 440, {}),
+	# negative stock, then stock that neutralizes it
+	("_Test Item 2", WAREHOUSE, "2026-01-05 10:00", "SE-7", -4, -200, {}),
+	("_Test Item 2", WAREHOUSE, "2026-01-25 10:00", "SE-8", 6, 300, {}),
+	("_Test Item 2", WAREHOUSE, "2026-02-15 10:00", "SE-9", 3, 165, {}),
+	# serialized stock counts one slot per serial no
+	(
+		"_Test Serialized Item",
+		WAREHOUSE,
+		"2026-01-03 10:00",
+		"SE-10",
+		3,
+		300,
+		{"serial_no": "SN-1\nSN-2\nSN-3", "has_serial_no": 1},
+	),
+	(
+		"_Test Serialized Item",
+		WAREHOUSE,
+		"2026-01-12 10:00",
+		"SE-11",
+		-1,
+		-100,
+		{"serial_no": "SN-2", "has_serial_no": 1},
+	),
+]
+
+
+class TestStreamingFIFOSlots(FrappeTestCase):
+	def get_fifo_queues(self, entries: list[frappe._dict]) -> tuple[dict, dict]:
+		"""FIFO queues by item and warehouse, streamed and from `FIFOSlots` over the same rows."""
+		streaming = StreamingFIFOSlots()
+		# both adjust the quantity of reconciliation rows in place
+		for entry in copy.deepcopy(entries):
+			streaming.update(entry)
+
+		fifo_slots = FIFOSlots(
+			{"company": "_Test Company", "to_date": "2026-03-31", "show_warehouse_wise_stock": 1},
+			copy.deepcopy(entries),
+		)
+
+		expected = {key: details["fifo_queue"] for key, details in fifo_slots.generate().items()}
+		actual = {key: details["fifo_queue"] for key, details in streaming.item_details.items()}
+		return actual, expected
+
+	def test_fifo_queues_match_stock_ageing(self):
+		actual, expected = self.get_fifo_queues(get_ledger_entries(LEDGER_ENTRIES))
+
+		self.assertEqual(actual, expected)
+		# the transfer took every older slot, the repacked stock included
+		self.assertEqual(
+			actual[("_Test Item", WAREHOUSE)],
+			[[5.0, getdate("2026-02-01"), 610.0]],
+		)
+		self.assertEqual(
+			[slot[0] for slot in actual[("_Test Serialized Item", WAREHOUSE)]], ["SN-1", "SN-3"]
+		)
+
+	def test_fifo_queues_match_stock_ageing_for_every_prefix(self):
+		"""Queues match after every entry, not only once the ledger is consumed."""
+		entries = get_ledger_entries(LEDGER_ENTRIES)
+		for end in range(1, len(entries) + 1):
+			actual, expected = self.get_fifo_queues(entries[:end])
+			self.assertEqual(actual, expected, msg=f"after {entries[end - 1].voucher_no}")
+
+	def test_transfers_are_dropped_past_their_posting_time(self):
+		streaming = StreamingFIFOSlots()
+		for entry in get_ledger_entries(LEDGER_ENTRIES[:4]):
+			streaming.update(entry)
+
+		self.assertTrue(streaming.transferred_item_details)
+
+		for entry in get_ledger_entries(LEDGER_ENTRIES[:6])[4:]:
+			streaming.update(entry)
+
+		self.assertEqual(list(streaming.transferred_item_details), [("SE-5", "_Test Item", WAREHOUSE)])
@@ -0,0 +1,71 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+import os
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from trikaya.trikaya.report.stock_balance_report.spill import SpillingRowMap
+
+
+class TestSpillingRowMap(FrappeTestCase):
+	def setUp(self):
+		self.map = SpillingRowMap(max_rows=2)
+		self.addCleanup(self.map.close)
+
+	def add(self, key: tuple, qty: float) -> None:
+		if key not in self.map:
+			self.map[key] = frappe._dict(qty=0.0)
+
+		self.map[key].qty += qty
+
+	def test_rows_past_max_rows_are_merged(self):
+		keys = [("_Test Company", f"_Test Item {index}", "_Test Warehouse - _TC") for index in range(5)]
+		for key in keys:
+			self.add(key, 1)
+
+		self.assertTrue(self.map.spills)
+		self.assertLessEqual(len(self.map.rows), 2)
+
+		# spilled rows come back to memory and keep their place
+		self.add(keys[0], 2)
+		self.add(keys[3], 5)
+		self.add(("_Test Company", "_Test Item 5", "_Test Warehouse - _TC"), 7)
+		self.add(keys[0], 4)
+
+		self.assertEqual(
+			list(self.map.items()),
+			[
+				(keys[0], {"qty": 7.0}),
+				(keys[1], {"qty": 1.0}),
+				(keys[2], {"qty": 1.0}),
+				(keys[3], {"qty": 6.0}),
+				(keys[4], {"qty": 1.0}),
+				(("_Test Company", "_Test Item 5", "_Test Warehouse - _TC"), {"qty": 7.0}),
+			],
+		)
+		self.assertEqual(len(self.map), 6)
+		self.assertEqual(list(self.map.keys()), [key for key, _row in self.map.items()])
+
+	def test_keys_with_dimensions(self):
+		"""Keys of different lengths and empty dimensions stay distinct."""
+		keys = [
+			("_Test Company", "_Test Item", "_Test Warehouse - _TC"),
+			("_Test Company", "_Test Item", "_Test Warehouse - _TC", "Shelf 1"),
+			("_Test Company", "_Test Item", "_Test Warehouse - _TC", "Shelf 1", None),
+		]
+		for qty, key in enumerate(keys * 2, start=1):
+			self.add(key, qty)
+
+		self.assertEqual([row.qty for row in self.map.values()], [5.0, 7.0, 9.0])
+		self.assertIn(keys[1], self.map)
+		self.assertNotIn(("_Test Company", "_Test Item", "_Test Warehouse 1 - _TC"), self.map)
+
+	def test_close_removes_the_file(self):
+		for index in range(3):
+			self.add(("_Test Company", f"_Test Item {index}", "_Test Warehouse - _TC"), 1)
+
+		self.assertTrue(os.path.exists(self.map.path))
+		self.map.close()
+		self.assertFalse(os.path.exists(self.map.path))
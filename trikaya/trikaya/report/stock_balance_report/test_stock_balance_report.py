@@ -0,0 +1,222 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext.stock.doctype.inventory_dimension.test_inventory_dimension import (
+	create_inventory_dimension,
+	prepare_test_data,
+)
+
+from trikaya.trikaya.doctype.stock_balance_snapshot.test_stock_balance_snapshot import (
+	COMPANY,
+	delete_stock_ledger_entries,
+	make_stock_ledger_entry,
+)
+from trikaya.trikaya.report.stock_balance_report.stock_balance_report import (
+	StockBalanceReport,
+	StockBalanceRow,
+)
+
+test_dependencies = ["Company", "Item", "Warehouse"]
+
+WAREHOUSE = "_Test Warehouse - _TC"
+WAREHOUSE_1 = "_Test Warehouse 1 - _TC"
+
+
+class TestStockBalanceReport(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		prepare_test_data()
+		create_inventory_dimension(
+			reference_document="Shelf", dimension_name="Shelf", apply_to_all_doctypes=1
+		)
+		# dimensions are cached for the request
+		frappe.local.inventory_dimensions = {}
+
+	def setUp(self):
+		self.addCleanup(delete_stock_ledger_entries)
+
+		make_stock_ledger_entry("_Test Item", WAREHOUSE, "2026-03-02", 10, 100)
+		make_stock_ledger_entry("_Test Item", WAREHOUSE, "2026-03-12", -3, 100)
+		make_stock_ledger_entry(
+			"_Test Item",
+			WAREHOUSE,
+			"2026-03-15",
+			13,
+			110,
+			voucher_type="Stock Reconciliation",
+			qty_after_transaction=20,
+		)
+		make_stock_ledger_entry("_Test Item", WAREHOUSE, "2026-03-20", -5, 110)
+		make_stock_ledger_entry("_Test Item", WAREHOUSE, "2026-03-25", 2, 105)
+		# inserted last but posted first on the day, the rate of the 10:00 entry is the latest
+		make_stock_ledger_entry("_Test Item", WAREHOUSE, "2026-03-25", 1, 99, posting_time="09:00:00")
+
+		make_stock_ledger_entry("_Test Item 2", WAREHOUSE_1, "2026-03-05", 6, 40, shelf="Shelf 1")
+		make_stock_ledger_entry("_Test Item 2", WAREHOUSE_1, "2026-03-14", 4, 45, shelf="Shelf 2")
+		make_stock_ledger_entry("_Test Item 2", WAREHOUSE_1, "2026-03-18", -2, 42, shelf="Shelf 1")
+		make_stock_ledger_entry(
+			"_Test Item 2",
+			WAREHOUSE_1,
+			"2026-03-22",
+			1,
+			44,
+			shelf="Shelf 2",
+			voucher_type="Stock Reconciliation",
+			qty_after_transaction=5,
+		)
+		make_stock_ledger_entry("_Test Item 2", WAREHOUSE, "2026-03-28", 3, 50)
+
+	def run_report(self, sql_aggregation: bool, **filters) -> dict:
+		"""Report rows by group by key, aggregated in SQL or by streaming the ledger."""
+		self.set_sql_aggregation(sql_aggregation)
+
+		report = StockBalanceReport(
+			frappe._dict(
+				{
+					"company": COMPANY,
+					"from_date": "2026-03-10",
+					"to_date": "2026-03-31",
+					"ignore_closing_balance": 1,
+					**filters,
+				}
+			)
+		)
+		report.allow_shards = False
+		_columns, data = report.run()
+
+		self.assertEqual(report.use_sql_aggregation(), sql_aggregation)
+		return {report.get_group_by_key(row): row for row in data}
+
+	def set_sql_aggregation(self, enabled: bool):
+		previous = frappe.conf.get("stock_balance_report_sql_aggregation")
+		frappe.conf.stock_balance_report_sql_aggregation = int(enabled)
+		self.addCleanup(frappe.conf.update, {"stock_balance_report_sql_aggregation": previous})
+
+	def test_sql_aggregation_matches_streaming(self):
+		expected = self.run_report(sql_aggregation=False)
+		self.assertEqual(self.run_report(sql_aggregation=True), expected)
+
+		row = expected[(COMPANY, "_Test Item", WAREHOUSE)]
+		self.assertEqual(row.opening_qty, 10)
+		# the reconciliation resets the balance to 20 from 7
+		self.assertEqual(row.in_qty, 16)
+		self.assertEqual(row.bal_qty, 18)
+		self.assertEqual(row.val_rate, 105)
+
+	def test_sql_aggregation_matches_streaming_dimension_wise(self):
+		expected = self.run_report(sql_aggregation=False, show_dimension_wise_stock=1)
+		self.assertEqual(self.run_report(sql_aggregation=True, show_dimension_wise_stock=1), expected)
+
+		self.assertEqual(expected[(COMPANY, "_Test Item 2", WAREHOUSE_1, "Shelf 1")].bal_qty, 4)
+		self.assertEqual(expected[(COMPANY, "_Test Item 2", WAREHOUSE_1, "Shelf 2")].bal_qty, 5)
+		self.assertIn((COMPANY, "_Test Item 2", WAREHOUSE), expected)
+
+	def test_sql_aggregation_matches_streaming_by_dimension_filter(self):
+		expected = self.run_report(sql_aggregation=False, shelf=["Shelf 2"])
+		self.assertEqual(self.run_report(sql_aggregation=True, shelf=["Shelf 2"]), expected)
+
+	def test_periods_match_sql_aggregation(self):
+		"""Runs with period columns are streamed, their rows match the rows summed in SQL."""
+		self.set_sql_aggregation(True)
+		report = StockBalanceReport(
+			frappe._dict(
+				{
+					"company": COMPANY,
+					"from_date": "2026-03-10",
+					"to_date": "2026-03-31",
+					"ignore_closing_balance": 1,
+					"periodicity": "Weekly",
+				}
+			)
+		)
+		self.assertFalse(report.use_sql_aggregation())
+
+		expected = self.run_report(sql_aggregation=True)
+		report.allow_shards = False
+		_columns, data = report.run()
+
+		for row in data:
+			key = report.get_group_by_key(row)
+			self.assertEqual({field: row[field] for field in expected[key]}, expected[key])
+			self.assertAlmostEqual(row[f"{report.period_fieldnames[-1]}_bal_qty"], row.bal_qty)
+
+
+class TestStockBalanceRow(FrappeTestCase):
+	def make_row(self, **kwargs) -> StockBalanceRow:
+		return StockBalanceRow(
+			item_code="_Test Item",
+			warehouse=WAREHOUSE,
+			item_group="_Test Item Group",
+			company=COMPANY,
+			currency="INR",
+			stock_uom="_Test UOM",
+			item_name="_Test Item",
+			**kwargs,
+		)
+
+	def test_fields_and_dimensions(self):
+		row = self.make_row(opening_qty=4, opening_val=40, val_rate=10)
+		row["shelf"] = "Shelf 1"
+		row["in_qty"] = 2
+
+		self.assertEqual(row.bal_qty, 4)
+		self.assertEqual(row["in_qty"], 2)
+		self.assertEqual(row.get("shelf"), "Shelf 1")
+		self.assertIsNone(row.get("batch_no"))
+		self.assertRaises(KeyError, row.__getitem__, "batch_no")
+		# slotted, fields outside the slots are dimensions
+		self.assertRaises(AttributeError, setattr, row, "shelf", "Shelf 2")
+
+		self.assertEqual(
+			row.as_dict(),
+			{
+				"item_code": "_Test Item",
+				"warehouse": WAREHOUSE,
+				"item_group": "_Test Item Group",
+				"company": COMPANY,
+				"currency": "INR",
+				"stock_uom": "_Test UOM",
+				"item_name": "_Test Item",
+				"opening_qty": 4,
+				"opening_val": 40,
+				"opening_fifo_queue": [],
+				"in_qty": 2,
+				"in_val": 0.0,
+				"out_qty": 0.0,
+				"out_val": 0.0,
+				"bal_qty": 4,
+				"bal_val": 40,
+				"val_rate": 10,
+				"shelf": "Shelf 1",
+			},
+		)
+
+	def test_round_amounts(self):
+		row = self.make_row(val_rate=10)
+		row.bal_qty = 0.0001
+		self.assertFalse(row.round_amounts(3))
+		self.assertEqual(row.bal_qty, 0)
+
+		row.in_qty = 1.23456
+		self.assertTrue(row.round_amounts(3))
+		self.assertEqual(row.in_qty, 1.235)
+
+	def test_period_values(self):
+		row = self.make_row(opening_qty=5, opening_val=50)
+		row.periods = {}
+		row.add_to_period(0, 3, 30, 3)
+		row.add_to_period(0, -1, -10, 3)
+		row.add_to_period(2, -2, -20, 3)
+
+		values = row.get_period_values(["p1", "p2", "p3"], 3)
+
+		fields = ("opening_qty", "in_qty", "out_qty", "bal_qty")
+		self.assertEqual(
+			[[values[f"{prefix}_{field}"] for field in fields] for prefix in ("p1", "p2", "p3")],
+			[[5, 3, 1, 7], [7, 0, 0, 7], [7, 0, 2, 5]],
+		)
+		self.assertEqual(values["p3_bal_val"], 50)
@@ -0,0 +1,71 @@
+# Copyright (c) 2026, IBSL and contributors
+# For license information, please see license.txt
+
+"""Nested set filters on Item Group and Warehouse trees.
+
+A selected group matches every node with `lft`/`rgt` inside its own range, so the
+report filters on a join with the tree table and a few range conditions instead of
+an IN list of every descendant. The ranges of the selected groups are cached in the
+worker process and checked against a version in redis, which the Item Group and
+Warehouse doc events bump whenever a tree changes.
+"""
+
+import frappe
+from frappe.query_builder import Criterion
+from frappe.utils import cint
+
+MAX_CACHED_SELECTIONS = 1024
+
+_tree_bounds_cache = {}
+
+
+def get_tree_bounds(doctype: str, names: str | list[str]) -> list[tuple[int, int]]:
+	"""`lft`/`rgt` ranges of the selected nodes, without ranges nested in another selected one."""
+	if isinstance(names, str):
+		names = [names]
+
+	cache_key = (frappe.local.site, doctype, tuple(sorted(names)))
+	version = get_version(doctype)
+
+	cached = _tree_bounds_cache.get(cache_key)
+	if cached and cached[0] == version:
+		return cached[1]
+
+	bounds = frappe.get_all(
+		doctype, filters={"name": ("in", names)}, fields=["lft", "rgt"], order_by="lft asc", as_list=True
+	)
+
+	merged = []
+	for lft, rgt in bounds:
+		if merged and rgt <= merged[-1][1]:
+			continue
+
+		merged.append((lft, rgt))
+
+	if len(_tree_bounds_cache) >= MAX_CACHED_SELECTIONS:
+		_tree_bounds_cache.clear()
+
+	_tree_bounds_cache[cache_key] = (version, merged)
+	return merged
+
+
+def get_tree_criterion(tree_table, doctype: str, names: str | list[str]):
+	"""Condition on the joined `tree_table` matching the selected nodes and their descendants."""
+	bounds = get_tree_bounds(doctype, names)
+	if not bounds:
+		# none of the selected nodes exist
+		return tree_table.name.isnull()
+
+	return Criterion.any((tree_table.lft >= lft) & (tree_table.rgt <= rgt) for lft, rgt in bounds)
+
+
+def invalidate(doctype: str) -> None:
+	frappe.cache.incr(get_version_key(doctype))
+
+
+def get_version(doctype: str) -> int:
+	return cint(frappe.cache.get(get_version_key(doctype)))
+
+
+def get_version_key(doctype: str) -> str:
+	return frappe.cache.make_key(f"stock_balance_report_tree_version|{doctype}")